@@ -9,6 +9,11 @@ from bson.objectid import ObjectId
 import os
 import uuid
 import traceback
+import threading
+from utils.cache import init_cache_store, cache_stats
+from utils.llm_client import llm_client_stats
+from utils.structured_output import parse_stats
+from utils.jobs import init_jobs
 
 load_dotenv()
 
@@ -97,6 +102,10 @@ except Exception as e:
 # Set app.mongo for routes
 app.mongo = mongo
 
+# Use MongoDB as the persistent tier of the AI response caches
+if mongo is not None and mongo.db is not None:
+    init_cache_store(mongo.db)
+
 # Additional debugging for PyMongo state
 if mongo:
     print(f"[DEBUG] mongo.cx type: {type(mongo.cx)}")
@@ -237,6 +246,7 @@ try:
     from routes.knowledge_graph import knowledge_graph_bp
     from routes.chatbot import chatbot_bp
     from routes.report import report_bp
+    from routes.jobs import jobs_bp
     
     app.register_blueprint(documents_bp, url_prefix='/api/documents')
     app.register_blueprint(transcription_bp, url_prefix='/api/transcription')
@@ -244,9 +254,18 @@ try:
     app.register_blueprint(knowledge_graph_bp, url_prefix='/api/knowledge-graph')
     app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
     app.register_blueprint(report_bp, url_prefix='/api/report')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
     
     print(f"[DEBUG] ✅ All blueprints registered successfully")
     
+    # Job handlers are registered by the route modules above
+    init_jobs(mongo.db if mongo else None)
+    
+    # Model clients and vector store libraries load on first use; optionally warm them in the background
+    if os.getenv('AI_PREWARM', '').lower() in ('1', 'true', 'yes'):
+        from utils.ai import prewarm
+        threading.Thread(target=prewarm, name='ai-prewarm', daemon=True).start()
+    
 except ImportError as e:
     print(f"[DEBUG] ⚠️ Warning: Could not import some routes: {e}")
     traceback.print_exc()
@@ -257,7 +276,10 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
         'mongo_connected': bool(mongo and mongo.db),
-        'environment': 'production' if IS_PRODUCTION else 'development'
+        'environment': 'production' if IS_PRODUCTION else 'development',
+        'caches': cache_stats(),
+        'llm': llm_client_stats(),
+        'structured_output': parse_stats.stats()
     }
     
     if mongo and mongo.db:
@@ -0,0 +1,303 @@
+"""Benchmark the document AI pipeline on synthetic contracts.
+
+Every stage runs against the fake model provider (see utils/providers.py),
+so the numbers measure our own chunking, embedding, retrieval and
+reduction overhead rather than network latency. Run from backend/:
+
+    python -m benchmarks.bench_pipeline --sizes 10KB,1MB,50MB --output results.json
+    python -m benchmarks.bench_pipeline --compare results.json
+
+Results are written as JSON with per-stage latency percentiles, throughput
+and peak RSS, and --compare prints the p50 change against an earlier run.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PARTIES = [
+    "Acme Holdings Ltd", "Borealis Capital LLC", "Cobalt Logistics Inc", "Delta Pharma GmbH",
+    "Evergreen Realty Trust", "Fulcrum Software Corp", "Granite Insurance Co", "Harbor Energy Partners"
+]
+PEOPLE = ["Alice Morgan", "Benjamin Okafor", "Chen Wei", "Daniela Ruiz", "Erik Lindqvist", "Fatima Haddad"]
+CLAUSES = [
+    "{a} shall indemnify and hold harmless {b} against all losses arising from any breach of the representations in Section {n}.",
+    "This Agreement shall be governed by the laws of the State of {state}, and {a} submits to the exclusive jurisdiction of its courts.",
+    "Either party may terminate this Agreement upon {days} days written notice if the other party materially breaches Section {n}.",
+    "{a} grants {b} a non-exclusive, non-transferable licence to use the Licensed Materials solely for internal business purposes.",
+    "All Confidential Information disclosed by {a} shall remain the property of {a} and shall be returned within {days} days of termination.",
+    "{person}, acting as authorised signatory for {a}, confirms that the Services will be delivered in accordance with Schedule {n}.",
+    "The aggregate liability of {b} under this Agreement shall not exceed the fees paid in the {days} days preceding the claim.",
+    "{b} shall pay all undisputed invoices within {days} days, and late payments accrue interest at {rate} percent per annum.",
+    "Neither party shall be liable for delays caused by events of force majeure, provided notice is given to {person} without delay.",
+    "Any amendment to this Agreement must be in writing and signed by {person} on behalf of {a} and an officer of {b}.",
+]
+STATES = ["Delaware", "New York", "California", "Texas", "Illinois"]
+
+QUESTIONS = [
+    "Who indemnifies whom under this agreement?",
+    "What is the notice period for termination?",
+    "Which law governs the contract?",
+    "What is the cap on liability?",
+    "When are invoices due?",
+]
+
+SIZE_UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "B": 1}
+
+def parse_size(value):
+    value = value.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+def format_size(size):
+    for unit in ["MB", "KB"]:
+        if size >= SIZE_UNITS[unit]:
+            return f"{size / SIZE_UNITS[unit]:g}{unit}"
+    return f"{size}B"
+
+def synthetic_contract(size, seed=0):
+    """Deterministic contract-like text of about size bytes"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    section = 1
+    while length < size:
+        if rng.random() < 0.08:
+            line = f"\n\nARTICLE {section}. {rng.choice(['DEFINITIONS', 'TERM', 'PAYMENT', 'LIABILITY', 'CONFIDENTIALITY', 'GENERAL'])}\n\n"
+            section += 1
+        else:
+            a, b = rng.sample(PARTIES, 2)
+            line = rng.choice(CLAUSES).format(
+                a=a, b=b, person=rng.choice(PEOPLE), state=rng.choice(STATES),
+                n=f"{rng.randint(1, 30)}.{rng.randint(1, 9)}", days=rng.choice([10, 30, 60, 90]),
+                rate=rng.choice([1.5, 2, 5])
+            ) + " "
+        parts.append(line)
+        length += len(line)
+    return "".join(parts)[:size]
+
+def synthetic_entities(size, seed=0):
+    """Entity lists as produced by per-chunk graph extraction, about half duplicates"""
+    rng = random.Random(seed)
+    count = max(10, size // 200)
+    names = PARTIES + PEOPLE + [f"Schedule {i}" for i in range(count // 4)]
+    return [
+        {"id": f"entity_{i}", "label": rng.choice([str.lower, str.upper, str.title])(rng.choice(names)), "type": "company"}
+        for i in range(count)
+    ]
+
+class RSSSampler:
+    """Samples resident set size in the background to find a stage's peak"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # No procfs (e.g. macOS): fall back to the process-wide peak
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss if sys.platform == "darwin" else rss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(stage, size, timings, peak_rss, scans_corpus=True):
+    mean = statistics.mean(timings)
+    return {
+        "stage": stage,
+        "size_bytes": size,
+        "runs": len(timings),
+        "latency_ms": {
+            "min": round(min(timings) * 1000, 3),
+            "p50": round(percentile(timings, 50) * 1000, 3),
+            "p90": round(percentile(timings, 90) * 1000, 3),
+            "p99": round(percentile(timings, 99) * 1000, 3),
+            "max": round(max(timings) * 1000, 3),
+            "mean": round(mean * 1000, 3),
+        },
+        "throughput_mb_s": round(size / SIZE_UNITS["MB"] / mean, 3) if mean and scans_corpus else None,
+        "peak_rss_mb": round(peak_rss / SIZE_UNITS["MB"], 1),
+    }
+
+def measure(fn, runs, setup=None):
+    """Time fn over several runs; returns (timings, peak RSS)"""
+    timings = []
+    with RSSSampler() as sampler:
+        for run in range(runs):
+            arg = setup(run) if setup else None
+            start = time.perf_counter()
+            fn(arg)
+            timings.append(time.perf_counter() - start)
+    return timings, sampler.peak
+
+def run_benchmarks(args):
+    from utils import ai
+
+    results = []
+    for size in args.sizes:
+        text = synthetic_contract(size, seed=args.seed)
+        entities = synthetic_entities(size, seed=args.seed)
+        runs = args.repeat if size <= args.large_threshold else 1
+        label = format_size(size)
+        print(f"[BENCH] {label}: {len(text)} chars, {runs} runs per stage", file=sys.stderr)
+
+        def fresh_store(run):
+            # Start every run from an empty embedding cache and no store on disk
+            document_id = f"bench_{size}_{run}"
+            ai.embedding_cache.memory.clear()
+            ai.invalidate_vector_store(document_id, remove_files=True)
+            return document_id
+
+        stages = [
+            ("chunk_transcript", lambda _: ai.chunk_transcript(text, ai.GRAPH_CHUNK_TOKENS), None),
+            ("create_vector_store", lambda document_id: ai.create_vector_store(document_id, text), fresh_store),
+            ("_deduplicate_entities", lambda _: ai._deduplicate_entities(entities), None),
+            ("generate_summary", lambda _: ai.generate_summary(text, use_cache=False), None),
+        ]
+        for stage, fn, setup in stages:
+            timings, peak = measure(fn, runs, setup)
+            results.append(summarize(stage, size, timings, peak))
+            print(f"[BENCH] {label} {stage}: p50 {results[-1]['latency_ms']['p50']} ms", file=sys.stderr)
+
+        # Retrieval against the store built above, one timing per question
+        document_id = f"bench_{size}_query"
+        ai.create_vector_store(document_id, text)
+        questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(max(runs, args.queries))]
+        timings, peak = measure(
+            lambda question: ai.chatbot_answer(document_id, question, use_cache=False),
+            len(questions),
+            lambda run: questions[run]
+        )
+        results.append(summarize("chatbot_answer", size, timings, peak, scans_corpus=False))
+        print(f"[BENCH] {label} chatbot_answer: p50 {results[-1]['latency_ms']['p50']} ms", file=sys.stderr)
+
+    return results
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(results):
+    print(f"{'size':>8} {'stage':<24} {'runs':>4} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'MB/s':>9} {'RSS MB':>8}")
+    for r in results:
+        latency = r["latency_ms"]
+        print(
+            f"{format_size(r['size_bytes']):>8} {r['stage']:<24} {r['runs']:>4} {latency['p50']:>10.2f} "
+            f"{latency['p90']:>10.2f} {latency['p99']:>10.2f} {r['throughput_mb_s'] or 0:>9.2f} {r['peak_rss_mb']:>8.1f}"
+        )
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["stage"], r["size_bytes"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    for r in results:
+        before = previous.get((r["stage"], r["size_bytes"]))
+        if not before or not before["latency_ms"]["p50"]:
+            continue
+        change = (r["latency_ms"]["p50"] / before["latency_ms"]["p50"] - 1) * 100
+        print(f"{format_size(r['size_bytes']):>8} {r['stage']:<24} p50 {before['latency_ms']['p50']:.2f} -> {r['latency_ms']['p50']:.2f} ms ({change:+.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10KB,100KB,1MB,10MB,50MB",
+                        help="comma separated corpus sizes, e.g. 10KB,1MB,50MB")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage for small corpora")
+    parser.add_argument("--large-threshold", default="5MB", help="corpora above this size run each stage once")
+    parser.add_argument("--queries", type=int, default=20, help="chatbot questions per corpus")
+    parser.add_argument("--latency-ms", type=float, default=0, help="injected latency per model call")
+    parser.add_argument("--summary-chunk-tokens", type=int, default=8000,
+                        help="summary chunk cap, kept low so the map-reduce path is exercised")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="print p50 changes against an earlier JSON result")
+    args = parser.parse_args(argv)
+    args.sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    args.large_threshold = parse_size(args.large_threshold)
+
+    # The environment must be in place before utils.ai reads it at import time
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["LLM_CACHE_DISABLED"] = "1"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_ERROR_RATE"] = "0"
+    os.environ["AI_SUMMARY_CHUNK_TOKENS"] = str(args.summary_chunk_tokens)
+    sys.path.insert(0, BACKEND_DIR)
+
+    # Vector stores are written relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = run_benchmarks(args)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "latency_ms": args.latency_ms,
+            "summary_chunk_tokens": args.summary_chunk_tokens,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    print_table(results)
+    if args.compare:
+        print_comparison(results, args.compare)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
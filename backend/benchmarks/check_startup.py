@@ -0,0 +1,73 @@
+"""Check that importing the API routes stays within a startup budget.
+
+app.py imports every blueprint before the first request (including
+/api/health) can be served, so anything those imports pull in is paid on
+every cold start and worker boot. This imports the same route modules in
+fresh interpreters and fails if the median import time exceeds the budget
+or if any of the slow AI libraries were loaded eagerly. Run from backend/:
+
+    python -m benchmarks.check_startup
+    python -m benchmarks.check_startup --budget 1.0 --repeat 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The blueprints app.py registers
+ROUTE_MODULES = [
+    "routes.documents", "routes.transcription", "routes.summary", "routes.knowledge_graph",
+    "routes.chatbot", "routes.report", "routes.jobs",
+]
+# Must only load on first use (or in utils.ai.prewarm)
+DEFERRED_MODULES = [
+    "google.generativeai", "langchain_google_genai", "langchain_core", "faiss",
+]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+def probe(provider):
+    env = dict(os.environ, LLM_PROVIDER=provider, AI_PREWARM="")
+    code = PROBE.format(modules=ROUTE_MODULES, deferred=DEFERRED_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    # Route modules may print while importing; the probe's result is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=1.5, help="maximum median import time in seconds")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--provider", default="gemini", help="LLM_PROVIDER to import under")
+    args = parser.parse_args(argv)
+
+    runs = [probe(args.provider) for _ in range(args.repeat)]
+    median = statistics.median(run["seconds"] for run in runs)
+    loaded = sorted({module for run in runs for module in run["loaded"]})
+
+    print(f"Route imports: median {median:.3f}s over {args.repeat} runs (budget {args.budget:.3f}s)")
+    failed = False
+    if median > args.budget:
+        print("FAIL: startup imports are over budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: loaded at import time: {', '.join(loaded)}")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
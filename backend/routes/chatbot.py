@@ -1,13 +1,62 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from utils.ai import chatbot_answer, create_vector_store, load_vector_store, generate_simple_chat_response
+from utils.ai import (
+    chatbot_answer, create_vector_store, load_vector_store, generate_simple_chat_response,
+    stream_chatbot_answer, stream_simple_chat_response, needs_retrieval, truncate_for_chat,
+    answer_cache, answer_fingerprint, is_cacheable_answer, answer_suggested_questions, vector_store_exists
+)
+from utils.answer_cache import normalize_question
+from utils.jobs import job_handler, submit_job, serialize_job
+from utils.llm_client import CircuitOpenError
 from datetime import datetime
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
 import traceback
+import itertools
+import json
+import os
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
+FOLLOW_UP_SUGGESTIONS = [
+    "What were the key decisions made?",
+    "Can you summarize the action items?",
+    "Who were the main speakers?",
+    "What topics were discussed the most?"
+]
+
+MEETING_SUGGESTIONS = [
+    "What were the main discussion points?",
+    "Can you summarize this document?",
+    "Who participated the most in the discussion?",
+    "What decisions were made?",
+    "Were there any action items mentioned?",
+    "What questions were asked during the document?"
+]
+
+DOCUMENT_SUGGESTIONS = [
+    "What was the main topic of this document?",
+    "Can you provide a summary?",
+    "What were the key takeaways?",
+    "Were there any important decisions made?",
+    "What action items were discussed?",
+    "Who were the main speakers?"
+]
+
+# Answer every suggested question in one batched call when a document is ingested
+PRECOMPUTE_SUGGESTED_ANSWERS = os.getenv("PRECOMPUTE_SUGGESTED_ANSWERS", "1").lower() not in ("0", "false", "no")
+
+def suggestions_for(document):
+    """Suggested questions shown for a document"""
+    return MEETING_SUGGESTIONS if document.get('document_type') == 'webrtc' else DOCUMENT_SUGGESTIONS
+
+def precomputed_questions(document):
+    """Every question the UI may offer for a document, without duplicates"""
+    questions = {}
+    for question in suggestions_for(document) + FOLLOW_UP_SUGGESTIONS:
+        questions.setdefault(normalize_question(question), question)
+    return list(questions.values())
+
 def get_mongo():
     """Helper function to get mongo instance"""
     return current_app.mongo.db
@@ -20,6 +69,108 @@ def is_valid_objectid(id_string):
     except (InvalidId, TypeError):
         return False
 
+def save_chat_entry(db, document_id, user_id, message, response, cache_match=None):
+    """Record one question and answer in chat_history; cache hits are flagged"""
+    chat_entry = {
+        'document_id': document_id,
+        'user_id': user_id,
+        'message': message,
+        'response': response,
+        'timestamp': datetime.utcnow()
+    }
+    if cache_match:
+        chat_entry['cached'] = True
+        chat_entry['cache_match'] = cache_match
+    
+    try:
+        db.chat_history.insert_one(chat_entry)
+        print("[CHATBOT] Saved chat history")
+    except Exception as save_error:
+        print(f"[CHATBOT] Failed to save chat history: {str(save_error)}")
+
+def queue_suggested_answers(document, user_id=None, dedupe=True):
+    """Queue the ingest-time job that precomputes answers to suggested questions"""
+    if not PRECOMPUTE_SUGGESTED_ANSWERS or not (document.get('content') or '').strip():
+        return None
+    try:
+        return submit_job(
+            'suggested_answers',
+            {'mongo_id': str(document['_id'])},
+            user_id=user_id,
+            document_id=str(document['_id']),
+            dedupe=dedupe
+        )
+    except Exception as e:
+        print(f"[CHATBOT] Could not queue suggested answers for document {document['_id']}: {e}")
+        return None
+
+def find_suggested_answer(document, fingerprint, question):
+    """Answer stored on the document for a suggested question, if it is still current"""
+    stored = document.get('suggested_answers') or {}
+    if stored.get('fingerprint') != fingerprint:
+        return None
+    return (stored.get('answers') or {}).get(normalize_question(question))
+
+@job_handler('suggested_answers')
+def run_suggested_answers_job(job, mongo_id):
+    """Background job: answer a document's suggested questions in one model call"""
+    document = job.db.documents.find_one({'_id': ObjectId(mongo_id)})
+    if not document:
+        raise ValueError('Document not found')
+    
+    content = document.get('content', '')
+    fingerprint = answer_fingerprint(mongo_id, content)
+    answers = answer_suggested_questions(precomputed_questions(document), content)
+    
+    for question, answer in answers.items():
+        answer_cache.store(fingerprint, question, answer)
+    
+    # Keyed by normalised question; the fingerprint ties the answers to this version of the content
+    job.db.documents.update_one(
+        {'_id': document['_id'], 'content': content},
+        {'$set': {'suggested_answers': {
+            'fingerprint': fingerprint,
+            'answers': {normalize_question(q): a for q, a in answers.items()},
+            'created_at': datetime.utcnow()
+        }}}
+    )
+    return {'answered': len(answers)}
+
+def queue_vector_store_refresh(document_id, user_id, mongo_id):
+    """Re-index edited content in the background if the document already has a vector store.
+
+    The text is read from the document (mongo_id) when the job runs.
+    Unchanged chunks keep their vectors, so only edited ones are embedded.
+    """
+    if not vector_store_exists(document_id):
+        return None
+    params = {'document_id': document_id, 'mongo_id': mongo_id, 'user_id': user_id}
+    try:
+        # A build already in flight may be indexing the old text
+        return submit_job('vector_store', params, user_id=user_id, document_id=document_id, dedupe=False)
+    except Exception as e:
+        print(f"[CHATBOT] Could not queue vector store refresh for document {document_id}: {e}")
+        return None
+
+@job_handler('vector_store')
+def run_vector_store_job(job, document_id, mongo_id, user_id=None):
+    """Background job: build the vector store used to chat with a large document"""
+    def load_content():
+        document = job.db.documents.find_one({'_id': ObjectId(mongo_id)})
+        if not document:
+            raise ValueError('Document not found')
+        return document.get('content', ''), user_id or document.get('user_id')
+    
+    content, owner_id = load_content()
+    for _ in range(3):
+        create_vector_store(document_id, content, user_id=owner_id, progress=job.report_progress)
+        # An edit may have landed, and another build published, while this one ran; end on the latest text
+        latest, owner_id = load_content()
+        if latest == content:
+            break
+        content = latest
+    return {'document_id': document_id}
+
 @chatbot_bp.route('/<document_id>/chat', methods=['POST'])
 @jwt_required()
 def chat_with_document(document_id):
@@ -79,32 +230,56 @@ def chat_with_document(document_id):
                 ]
             })
         
+        # Identical (or near-identical) questions about this version of the document are answered once
+        fingerprint = answer_fingerprint(str(document['_id']), document_text)
+        cached = answer_cache.lookup(fingerprint, user_message)
+        if not cached:
+            suggested = find_suggested_answer(document, fingerprint, user_message)
+            cached = (suggested, 'suggestion') if suggested else None
+        if cached:
+            ai_response, cache_match = cached
+            print(f"[CHATBOT] Answer cache hit ({cache_match})")
+            save_chat_entry(db, document_id, user_id, user_message, ai_response, cache_match)
+            return jsonify({
+                'response': ai_response,
+                'suggestions': FOLLOW_UP_SUGGESTIONS,
+                'cached': True
+            })
+        
         # Generate response using AI - use vector store for large documents, simple response for small ones
         try:
             print("[CHATBOT] Generating AI response...")
             
-            # Check if we should use vector store (for large documents) or simple response
-            MAX_SIMPLE_RESPONSE_LENGTH = 30000  # Same as MAX_CONTEXT_SIZE in ai.py
-            
-            if len(document_text) > MAX_SIMPLE_RESPONSE_LENGTH:
+            # Use vector store for documents beyond the chat token budget, simple response otherwise
+            if needs_retrieval(document_text):
                 print(f"[CHATBOT] Large document ({len(document_text)} chars), using vector store")
                 
                 # Try to load existing vector store
                 vector_store = load_vector_store(document_id)
                 
                 if not vector_store:
-                    print("[CHATBOT] No vector store found, creating one...")
+                    print("[CHATBOT] No vector store found, building one in the background...")
                     try:
-                        vector_store = create_vector_store(document_id, document_text)
-                        print("[CHATBOT] Vector store created successfully")
+                        job = submit_job(
+                            'vector_store',
+                            {'document_id': document_id, 'mongo_id': str(document['_id'])},
+                            user_id=user_id,
+                            document_id=document_id
+                        )
+                        # The client waits for the job and then re-sends the question
+                        return jsonify({
+                            **serialize_job(job),
+                            'response': "I'm preparing this document for questions. This only happens once for large documents.",
+                            'retry_after_job': True
+                        }), 202
                     except Exception as vs_error:
-                        print(f"[CHATBOT] Failed to create vector store: {vs_error}")
+                        print(f"[CHATBOT] Failed to queue vector store build: {vs_error}")
                         # Fall back to simple response
-                        ai_response = generate_simple_chat_response(user_message, document_text[:MAX_SIMPLE_RESPONSE_LENGTH] + "...")
+                        ai_response = generate_simple_chat_response(user_message, truncate_for_chat(document_text))
                 
                 if vector_store:
                     # Use vector store for accurate responses
-                    ai_response = chatbot_answer(document_id, user_message)
+                    ai_response = chatbot_answer(document_id, user_message, vector_store=vector_store)
                     print(f"[CHATBOT] Used vector store for response")
             else:
                 print(f"[CHATBOT] Small document ({len(document_text)} chars), using simple response")
@@ -116,33 +291,19 @@ def chat_with_document(document_id):
             
             print(f"[CHATBOT] Generated response: {ai_response[:100]}...")
             
-            # Save chat history
-            chat_entry = {
-                'document_id': document_id,
-                'user_id': user_id,
-                'message': user_message,
-                'response': ai_response,
-                'timestamp': datetime.utcnow()
-            }
-            
-            try:
-                db.chat_history.insert_one(chat_entry)
-                print("[CHATBOT] Saved chat history")
-            except Exception as save_error:
-                print(f"[CHATBOT] Failed to save chat history: {str(save_error)}")
+            if is_cacheable_answer(ai_response):
+                answer_cache.store(fingerprint, user_message, ai_response)
             
-            suggestions = [
-                "What were the key decisions made?",
-                "Can you summarize the action items?",
-                "Who were the main speakers?",
-                "What topics were discussed the most?"
-            ]
+            # Save chat history
+            save_chat_entry(db, document_id, user_id, user_message, ai_response)
             
             return jsonify({
                 'response': ai_response,
-                'suggestions': suggestions
+                'suggestions': FOLLOW_UP_SUGGESTIONS
             })
             
+        except CircuitOpenError as ai_error:
+            return jsonify({'error': str(ai_error)}), 503
         except Exception as ai_error:
             print(f"[CHATBOT] AI response error: {str(ai_error)}")
             traceback.print_exc()
@@ -153,6 +314,138 @@ def chat_with_document(document_id):
         traceback.print_exc()
         return jsonify({'error': 'Internal server error'}), 500
 
+def find_chat_document(db, document_id, user_id):
+    """Look up a document by any of its IDs; returns (document, error_response)"""
+    # Handle both ObjectId and UUID formats
+    if is_valid_objectid(document_id):
+        document = db.documents.find_one({'_id': ObjectId(document_id)})
+    else:
+        document = db.documents.find_one({'id': document_id})
+        if not document:
+            document = db.documents.find_one({'room_id': document_id.upper()})
+    
+    if not document:
+        return None, (jsonify({'error': 'Document not found'}), 404)
+    
+    # Check if user has access to this document
+    if document.get('host_id') == user_id or document.get('user_id') == user_id:
+        return document, None
+    
+    for participant in document.get('participants', []):
+        if participant.get('user_id') == user_id:
+            return document, None
+    
+    return None, (jsonify({'error': 'Access denied'}), 403)
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Stream SSE messages from a generator without proxy buffering"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@chatbot_bp.route('/<document_id>/chat/stream', methods=['POST'])
+@jwt_required()
+def stream_chat_with_document(document_id):
+    """Chat with AI about a document, streaming the answer as Server-Sent Events"""
+    user_id = get_jwt_identity()
+    db = get_mongo()
+    data = request.get_json()
+    
+    user_message = data.get('message') or data.get('question') if data else None
+    if not user_message or not user_message.strip():
+        return jsonify({'error': 'Message is required'}), 400
+    
+    document, error = find_chat_document(db, document_id, user_id)
+    if error:
+        return error
+    
+    document_text = document.get('content', '')
+    if not document_text.strip():
+        # Same events as any other answer, so the client has a single code path
+        def no_content():
+            ai_response = "I don't have access to the content of this document yet. Please make sure the document has been shared with me."
+            yield sse_event('token', {'text': ai_response})
+            yield sse_event('done', {'response': ai_response, 'suggestions': FOLLOW_UP_SUGGESTIONS})
+        
+        return sse_response(no_content())
+    
+    fingerprint = answer_fingerprint(str(document['_id']), document_text)
+    cached = answer_cache.lookup(fingerprint, user_message)
+    if not cached:
+        suggested = find_suggested_answer(document, fingerprint, user_message)
+        cached = (suggested, 'suggestion') if suggested else None
+    if cached:
+        def replay():
+            ai_response, cache_match = cached
+            save_chat_entry(db, document_id, user_id, user_message, ai_response, cache_match)
+            yield sse_event('token', {'text': ai_response})
+            yield sse_event('done', {'response': ai_response, 'suggestions': FOLLOW_UP_SUGGESTIONS, 'cached': True})
+        
+        return sse_response(replay())
+    
+    if needs_retrieval(document_text):
+        try:
+            vector_store = load_vector_store(document_id)
+            if not vector_store:
+                # Same contract as the non-streaming endpoint: wait for the job, then retry
+                job = submit_job(
+                    'vector_store',
+                    {'document_id': document_id, 'mongo_id': str(document['_id'])},
+                    user_id=user_id,
+                    document_id=document_id
+                )
+                return jsonify({**serialize_job(job), 'retry_after_job': True}), 202
+        except Exception as vs_error:
+            print(f"[CHATBOT] Vector store unavailable: {vs_error}")
+            vector_store = None
+        
+        if vector_store:
+            tokens = stream_chatbot_answer(document_id, user_message, vector_store=vector_store)
+        else:
+            # Fall back to answering from the start of the document, like the non-streaming endpoint
+            tokens = stream_simple_chat_response(user_message, truncate_for_chat(document_text))
+    else:
+        tokens = stream_simple_chat_response(user_message, document_text)
+    
+    # Start generating before the response is committed, so an open circuit breaker is still a 503
+    try:
+        first = list(itertools.islice(tokens, 1))
+    except CircuitOpenError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        print(f"[CHATBOT] Streaming error: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': 'Failed to generate AI response'}), 500
+    
+    def generate():
+        parts = []
+        try:
+            for text in itertools.chain(first, tokens):
+                parts.append(text)
+                yield sse_event('token', {'text': text})
+        except Exception as e:
+            print(f"[CHATBOT] Streaming error: {str(e)}")
+            traceback.print_exc()
+            yield sse_event('error', {'error': 'Failed to generate AI response'})
+            return
+        
+        ai_response = ''.join(parts)
+        if is_cacheable_answer(ai_response):
+            answer_cache.store(fingerprint, user_message, ai_response)
+        ai_response = ai_response or "I couldn't generate a response. Please try rephrasing your question."
+        
+        save_chat_entry(db, document_id, user_id, user_message, ai_response)
+        
+        yield sse_event('done', {'response': ai_response, 'suggestions': FOLLOW_UP_SUGGESTIONS})
+    
+    return sse_response(generate())
+
 @chatbot_bp.route('/<document_id>/history', methods=['GET'])
 @jwt_required()
 def get_chat_history(document_id):
@@ -241,30 +534,8 @@ def get_suggestions(document_id):
         if not user_has_access:
             return jsonify({'error': 'Access denied'}), 403
         
-        # Generate suggestions based on document type and content
-        document_type = document.get('document_type', 'regular')
-        suggestions = []
-        
-        if document_type == 'webrtc':
-            suggestions = [
-                "What were the main discussion points?",
-                "Can you summarize this document?",
-                "Who participated the most in the discussion?",
-                "What decisions were made?",
-                "Were there any action items mentioned?",
-                "What questions were asked during the document?"
-            ]
-        else:
-            suggestions = [
-                "What was the main topic of this document?",
-                "Can you provide a summary?",
-                "What were the key takeaways?",
-                "Were there any important decisions made?",
-                "What action items were discussed?",
-                "Who were the main speakers?"
-            ]
-        
-        return jsonify({'suggestions': suggestions})
+        # Generate suggestions based on document type
+        return jsonify({'suggestions': suggestions_for(document)})
         
     except Exception as e:
         print(f"[CHATBOT] Suggestions error: {str(e)}")
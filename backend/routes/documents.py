@@ -7,6 +7,11 @@ import uuid
 import io
 import PyPDF2
 from docx import Document
+from utils.ai import invalidate_vector_store, translate_document, assemble_translation, generate_document_insights
+from utils.jobs import job_handler, submit_job, serialize_job
+from routes.chatbot import queue_suggested_answers, queue_vector_store_refresh
+import hashlib
+import re
 
 documents_bp = Blueprint('documents', __name__)
 
@@ -22,6 +27,93 @@ def is_valid_objectid(id_string):
     except (InvalidId, TypeError):
         return False
 
+# Language codes accepted in translation URLs; full language names are passed through
+LANGUAGE_NAMES = {
+    'ar': 'Arabic', 'de': 'German', 'en': 'English', 'es': 'Spanish', 'fr': 'French', 'hi': 'Hindi',
+    'it': 'Italian', 'ja': 'Japanese', 'ko': 'Korean', 'nl': 'Dutch', 'pl': 'Polish', 'pt': 'Portuguese',
+    'ru': 'Russian', 'sv': 'Swedish', 'tr': 'Turkish', 'uk': 'Ukrainian', 'zh': 'Chinese'
+}
+LANGUAGE_PATTERN = re.compile(r'^[A-Za-z][A-Za-z -]{1,39}$')
+
+def content_hash(content):
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+def find_current_translation(db, document, language):
+    """Stored translation of the document's current content, assembled from cached chunks"""
+    stored = db.translations.find_one({'document_id': str(document['_id']), 'language': language})
+    if not stored or stored.get('content_hash') != content_hash(document.get('content')):
+        return None
+    return assemble_translation([tuple(entry) for entry in stored.get('manifest', [])])
+
+@job_handler('translation')
+def run_translation_job(job, mongo_id, language, refresh=False):
+    """Background job: translate a document, reusing every chunk translated before"""
+    document = job.db.documents.find_one({'_id': ObjectId(mongo_id)})
+    if not document:
+        raise ValueError('Document not found')
+    
+    content = document.get('content', '')
+    if not content.strip():
+        raise ValueError('Document has no content to translate')
+    
+    manifest = translate_document(content, language, use_cache=not refresh, progress=job.report_progress)
+    
+    # Only the manifest is stored; the translated chunks live in the translation cache
+    job.db.translations.update_one(
+        {'document_id': mongo_id, 'language': language},
+        {'$set': {
+            'document_id': mongo_id,
+            'language': language,
+            'content_hash': content_hash(content),
+            'manifest': [list(entry) for entry in manifest],
+            'created_at': datetime.utcnow()
+        }},
+        upsert=True
+    )
+    return {'language': language, 'chunks': len(manifest)}
+
+@job_handler('insights')
+def run_insights_job(job, mongo_id, refresh=False):
+    """Background job: compute document metrics and generate insights"""
+    document = job.db.documents.find_one({'_id': ObjectId(mongo_id)})
+    if not document:
+        raise ValueError('Document not found')
+    
+    content = document.get('content', '')
+    if not content.strip():
+        raise ValueError('Document has no content to analyze')
+    
+    result = generate_document_insights(
+        content,
+        use_cache=not refresh,
+        progress=job.report_progress,
+        checkpoint=job.checkpoint()
+    )
+    
+    job.db.insights.update_one(
+        {'document_id': mongo_id},
+        {'$set': {
+            'document_id': mongo_id,
+            'content_hash': content_hash(content),
+            'metrics': result['metrics'],
+            'insights': result['insights'],
+            'created_at': datetime.utcnow()
+        }},
+        upsert=True
+    )
+    return {'metrics': result['metrics']}
+
+def find_owned_document(db, document_id, user_id):
+    # Build query based on whether document_id is ObjectId or custom ID
+    if is_valid_objectid(document_id):
+        query = {
+            '$or': [{'id': document_id}, {'_id': ObjectId(document_id)}],
+            'user_id': user_id
+        }
+    else:
+        query = {'id': document_id, 'user_id': user_id}
+    return db.documents.find_one(query)
+
 @documents_bp.route('', methods=['GET'])
 @jwt_required()
 def get_documents():
@@ -138,6 +230,7 @@ def create_document():
     }
     
     result = db.documents.insert_one(document_data)
+    queue_suggested_answers({**document_data, '_id': result.inserted_id}, user_id)
     document_data['_id'] = str(result.inserted_id)
     
     # Also save the extracted text as a transcript
@@ -189,6 +282,14 @@ def update_document(document_id):
     
     db.documents.update_one({'_id': document['_id']}, {'$set': update_data})
     
+    # Re-embed only the chunks that changed, in the background, if the document already has a vector store
+    if 'content' in update_data:
+        if (update_data['content'] or '').strip():
+            for store_id in {document.get('id', str(document['_id'])), str(document['_id'])}:
+                queue_vector_store_refresh(store_id, user_id, mongo_id=str(document['_id']))
+        # A run already in flight may be answering the old content
+        queue_suggested_answers({**document, **update_data}, user_id, dedupe=False)
+    
     # Return updated document
     updated_document = db.documents.find_one({'_id': document['_id']})
     updated_document['_id'] = str(updated_document['_id'])
@@ -219,6 +320,12 @@ def delete_document(document_id):
     db.transcriptions.delete_many({'document_id': search_id})
     db.summaries.delete_many({'document_id': search_id})
     db.knowledge_graphs.delete_many({'document_id': search_id})
+    db.translations.delete_many({'document_id': str(document['_id'])})
+    db.insights.delete_many({'document_id': str(document['_id'])})
+    
+    # Drop cached and on-disk vector stores for the document
+    for store_id in {search_id, str(document['_id'])}:
+        invalidate_vector_store(store_id, remove_files=True)
     
     # Delete the document
     db.documents.delete_one({'_id': document['_id']})
@@ -285,6 +392,7 @@ def upload_document():
     }
     
     result = db.documents.insert_one(document_data)
+    queue_suggested_answers({**document_data, '_id': result.inserted_id}, user_id)
     document_data['_id'] = str(result.inserted_id)
     
     # Also save the extracted text as a transcript
@@ -388,4 +496,82 @@ def delete_folder(folder_id):
     if result.modified_count == 0:
         return jsonify({'error': 'Folder not found'}), 404
     
-    return jsonify({'message': 'Folder deleted'})
\ No newline at end of file
+    return jsonify({'message': 'Folder deleted'})
+
+@documents_bp.route('/<document_id>/translate/<language>', methods=['GET', 'POST'])
+@jwt_required()
+def translate_document_route(document_id, language):
+    """Return a stored translation, or (POST) queue a job to translate the document"""
+    user_id = get_jwt_identity()
+    db = get_mongo()
+    
+    language = LANGUAGE_NAMES.get(language.lower(), language.strip())
+    if not LANGUAGE_PATTERN.match(language):
+        return jsonify({'error': 'Invalid language'}), 400
+    
+    document = find_owned_document(db, document_id, user_id)
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+    
+    refresh = bool((request.get_json(silent=True) or {}).get('refresh')) if request.method == 'POST' else False
+    translation = None if refresh else find_current_translation(db, document, language)
+    if translation is not None:
+        return jsonify({'document_id': document_id, 'language': language, 'translation': translation})
+    
+    if request.method == 'GET':
+        return jsonify({'error': 'Translation not found'}), 404
+    
+    if not (document.get('content') or '').strip():
+        return jsonify({'error': 'Document has no content to translate'}), 400
+    
+    try:
+        job = submit_job(
+            'translation',
+            {'mongo_id': str(document['_id']), 'language': language, 'refresh': refresh},
+            user_id=user_id,
+            document_id=str(document['_id']),
+            dedupe_key=language
+        )
+        return jsonify(serialize_job(job)), 202
+    except Exception as e:
+        print(f"Error queueing translation job: {e}")
+        return jsonify({'error': f'Failed to translate document: {str(e)}'}), 500
+
+@documents_bp.route('/<document_id>/insights', methods=['GET', 'POST'])
+@jwt_required()
+def document_insights(document_id):
+    """Return stored insights for the current content, or (POST) queue a job to generate them"""
+    user_id = get_jwt_identity()
+    db = get_mongo()
+    
+    document = find_owned_document(db, document_id, user_id)
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+    
+    refresh = bool((request.get_json(silent=True) or {}).get('refresh')) if request.method == 'POST' else False
+    stored = None if refresh else db.insights.find_one({'document_id': str(document['_id'])})
+    if stored and stored.get('content_hash') == content_hash(document.get('content')):
+        return jsonify({
+            'document_id': document_id,
+            'metrics': stored.get('metrics', {}),
+            'insights': stored.get('insights', ''),
+            'created_at': stored['created_at'].isoformat() if stored.get('created_at') else None
+        })
+    
+    if request.method == 'GET':
+        return jsonify({'error': 'Insights not found'}), 404
+    
+    if not (document.get('content') or '').strip():
+        return jsonify({'error': 'Document has no content to analyze'}), 400
+    
+    try:
+        job = submit_job(
+            'insights',
+            {'mongo_id': str(document['_id']), 'refresh': refresh},
+            user_id=user_id,
+            document_id=str(document['_id'])
+        )
+        return jsonify(serialize_job(job)), 202
+    except Exception as e:
+        print(f"Error queueing insights job: {e}")
+        return jsonify({'error': f'Failed to generate insights: {str(e)}'}), 500
@@ -0,0 +1,45 @@
+from flask import Blueprint, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson.objectid import ObjectId
+from utils.jobs import poll_job, serialize_job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def can_read_job(job, user_id):
+    """Jobs are readable by whoever submitted them and by anyone with access to their document.
+
+    Jobs are deduplicated per document, so a meeting participant may be
+    handed a job another participant started.
+    """
+    if job.get('user_id') == user_id:
+        return True
+    
+    document_id = job.get('document_id')
+    if not document_id:
+        return False
+    
+    # Jobs record whichever of the document's ids the route was called with
+    lookups = [{'id': document_id}, {'room_id': document_id.upper()}]
+    if ObjectId.is_valid(document_id):
+        lookups.append({'_id': ObjectId(document_id)})
+    document = current_app.mongo.db.documents.find_one(
+        {'$or': lookups}, {'user_id': 1, 'host_id': 1, 'participants': 1}
+    )
+    if not document:
+        return False
+    
+    if document.get('host_id') == user_id or document.get('user_id') == user_id:
+        return True
+    return any(participant.get('user_id') == user_id for participant in document.get('participants', []))
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job_status(job_id):
+    """Report the status, progress and result of a background job"""
+    user_id = get_jwt_identity()
+    
+    job = poll_job(job_id)
+    if not job or not can_read_job(job, user_id):
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(serialize_job(job))
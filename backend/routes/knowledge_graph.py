@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.ai import generate_knowledge_graph
+from utils.jobs import job_handler, submit_job, serialize_job
 from datetime import datetime
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
@@ -15,6 +16,35 @@ def is_valid_objectid(id_string):
     except (InvalidId, TypeError):
         return False
 
+@job_handler('knowledge_graph')
+def run_knowledge_graph_job(job, storage_id, transcription_id=None, transcript=None, refresh=False):
+    """Background job: generate and store the knowledge graph for a document"""
+    db = job.db
+    
+    if transcript is None:
+        doc = db.transcriptions.find_one({'_id': ObjectId(transcription_id)})
+        transcript = doc.get('transcript', '') if doc else ''
+    
+    if not transcript or not transcript.strip():
+        raise ValueError('Empty transcript')
+    
+    print(f"[DEBUG] Generating knowledge graph for {storage_id}...")
+    graph = generate_knowledge_graph(transcript, use_cache=not refresh, progress=job.report_progress)
+    
+    # Store knowledge graph
+    db.knowledge_graphs.update_one(
+        {'document_id': storage_id},
+        {'$set': {
+            'document_id': storage_id,
+            'graph': graph,
+            'created_at': datetime.utcnow()
+        }},
+        upsert=True
+    )
+    
+    print(f"[DEBUG] Knowledge graph stored successfully")
+    return {'graph': graph}
+
 @knowledge_graph_bp.route('/<document_id>', methods=['POST'])
 @jwt_required()
 def generate_graph(document_id):
@@ -38,6 +68,9 @@ def generate_graph(document_id):
     
     # Get transcript from request or database
     transcript = request.json.get('transcript') if request.json else None
+    # 'refresh' forces a new generation instead of a cached response
+    refresh = bool(request.json.get('refresh')) if request.json else False
+    doc = None
     
     if not transcript:
         # Try to find transcript in database
@@ -61,29 +94,22 @@ def generate_graph(document_id):
     if not transcript or not transcript.strip():
         return jsonify({'error': 'Empty transcript'}), 400
     
+    # Use consistent ID for storage
+    storage_id = document.get('id', document_id)
+    
+    params = {'storage_id': storage_id, 'refresh': refresh}
+    if doc:
+        params['transcription_id'] = str(doc['_id'])
+    else:
+        params['transcript'] = transcript
+    
     try:
-        print(f"[DEBUG] Generating knowledge graph...")
-        graph = generate_knowledge_graph(transcript)
-        
-        # Use consistent ID for storage
-        storage_id = document.get('id', document_id)
-        
-        # Store knowledge graph
-        db.knowledge_graphs.update_one(
-            {'document_id': storage_id},
-            {'$set': {
-                'document_id': storage_id,
-                'graph': graph,
-                'created_at': datetime.utcnow()
-            }},
-            upsert=True
-        )
-        
-        print(f"[DEBUG] Knowledge graph stored successfully")
-        return jsonify({'graph': graph})
+        job = submit_job('knowledge_graph', params, user_id=user_id, document_id=storage_id)
+        print(f"[DEBUG] Knowledge graph job queued: {job['_id']}")
+        return jsonify(serialize_job(job)), 202
         
     except Exception as e:
-        print(f"Error generating knowledge graph: {e}")
+        print(f"Error queueing knowledge graph job: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to generate knowledge graph: {str(e)}'}), 500
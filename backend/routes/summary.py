@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.ai import generate_summary
+from utils.jobs import job_handler, submit_job, serialize_job
 from datetime import datetime
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
@@ -19,6 +20,38 @@ def is_valid_objectid(id_string):
     except (InvalidId, TypeError):
         return False
 
+@job_handler('summary')
+def run_summary_job(job, storage_id, transcription_id=None, transcript=None, refresh=False):
+    """Background job: generate and store the summary for a document"""
+    db = job.db
+    
+    if transcript is None:
+        doc = db.transcriptions.find_one({'_id': ObjectId(transcription_id)})
+        transcript = doc.get('transcript', '') if doc else ''
+    
+    if not transcript or not transcript.strip():
+        raise ValueError('Empty transcript')
+    
+    print(f"[DEBUG] Generating summary for {storage_id}...")
+    summary = generate_summary(
+        transcript,
+        use_cache=not refresh,
+        progress=job.report_progress,
+        checkpoint=job.checkpoint()
+    )
+    
+    db.summaries.update_one(
+        {'document_id': storage_id},
+        {'$set': {
+            'document_id': storage_id,
+            'summary': summary,
+            'created_at': datetime.utcnow()
+        }},
+        upsert=True
+    )
+    print(f"[DEBUG] Summary stored successfully")
+    return {'summary': summary}
+
 @summary_bp.route('/<document_id>', methods=['POST'])
 @jwt_required()
 def generate_document_summary(document_id):
@@ -46,6 +79,9 @@ def generate_document_summary(document_id):
     
     # Get transcript from request or database
     transcript = request.json.get('transcript') if request.json else None
+    # 'refresh' forces a new generation instead of a cached response
+    refresh = bool(request.json.get('refresh')) if request.json else False
+    doc = None
     
     if not transcript:
         # Try multiple ways to find the transcript with extensive debugging
@@ -130,27 +166,22 @@ Section 4: Next Steps
         print(f"[DEBUG] Empty transcript")
         return jsonify({'error': 'Empty transcript'}), 400
     
+    # Use the custom ID for storage if available, otherwise use document_id
+    storage_id = document.get('id', document_id)
+    
+    # Stored transcripts are passed by reference; ad-hoc ones travel with the job
+    params = {'storage_id': storage_id, 'refresh': refresh}
+    if doc:
+        params['transcription_id'] = str(doc['_id'])
+    else:
+        params['transcript'] = transcript
+    
     try:
-        print(f"[DEBUG] Generating summary...")
-        summary = generate_summary(transcript)
-        
-        # Use the custom ID for storage if available, otherwise use document_id
-        storage_id = document.get('id', document_id)
-        print(f"[DEBUG] Storing summary with document_id: {storage_id}")
-        
-        db.summaries.update_one(
-            {'document_id': storage_id},
-            {'$set': {
-                'document_id': storage_id,
-                'summary': summary,
-                'created_at': datetime.utcnow()
-            }},
-            upsert=True
-        )
-        print(f"[DEBUG] Summary stored successfully")
-        return jsonify({'summary': summary})
+        job = submit_job('summary', params, user_id=user_id, document_id=storage_id)
+        print(f"[DEBUG] Summary job queued: {job['_id']}")
+        return jsonify(serialize_job(job)), 202
     except Exception as e:
-        print(f"Error generating summary: {e}")
+        print(f"Error queueing summary job: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to generate summary: {str(e)}'}), 500
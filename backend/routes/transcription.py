@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
+from datetime import datetime
+from routes.chatbot import queue_suggested_answers, queue_vector_store_refresh
 
 transcription_bp = Blueprint('transcription', __name__)
 
@@ -62,6 +64,16 @@ def save_transcription(document_id):
     
     print(f"[DEBUG] Transcription saved. Matched: {result.matched_count}, Modified: {result.modified_count}, Upserted: {result.upserted_id}")
     
+    # Chat and its vector stores read documents.content, so an edited transcript is copied there first
+    transcript = (data.get('transcript') or '').strip()
+    if transcript and transcript != (document.get('content') or '').strip():
+        update_data = {'content': transcript, 'updated_at': datetime.utcnow()}
+        db.documents.update_one({'_id': document['_id']}, {'$set': update_data})
+        # Same background refresh as a document edit, for either id the store may be saved under
+        for store_id in {document.get('id', str(document['_id'])), str(document['_id'])}:
+            queue_vector_store_refresh(store_id, user_id, mongo_id=str(document['_id']))
+        queue_suggested_answers({**document, **update_data}, user_id, dedupe=False)
+    
     return jsonify({'status': 'saved'}), 201
 
 @transcription_bp.route('/<document_id>', methods=['GET'])
@@ -1,79 +1,407 @@
 import os
-import json
-import google.generativeai as genai
+import re
+import time
+import hashlib
+import importlib
+import shutil
+import threading
 from dotenv import load_dotenv
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from utils.chunking import iter_spans, iter_content_defined_spans
+from utils.cache import LRUCache, TieredCache, make_cache_key
+from utils.bm25 import BM25Index, reciprocal_rank_fusion
+from utils.answer_cache import AnswerCache, normalize_question
+from utils.entity_resolution import resolve_entities
+from utils.keyword_matcher import KeywordMatcher
+from utils.metrics import compute_document_metrics
+from utils.llm_client import get_llm_client, CircuitOpenError, LLM_MODEL
+from utils.providers import get_provider
+from utils.structured_output import (
+    GRAPH_SCHEMA, ANSWERS_SCHEMA, StructuredOutputError, parse_json_response, validate_graph, validate_answers
+)
+from utils.planner import plan_document, fits_in_context, context_budget, estimate_tokens, CHARS_PER_TOKEN
 
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
 
-# Initialize embeddings
-embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GEMINI_API_KEY)
+# Embedding vectors are cached by content hash, provider/model name and task type,
+# as packed float32 bytes so the in-process tier can be bounded by size
+EMBEDDING_MODEL = "models/embedding-001"
+embedding_cache = TieredCache(
+    "embedding_cache",
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "20000")),
+    max_bytes=int(os.getenv("EMBEDDING_CACHE_MB", "64")) * 1024 * 1024,
+    sizeof=len
+)
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+def get_embeddings():
+    """Process-wide embeddings client, built on first use so importing this module stays cheap"""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            from utils.embeddings import CachedEmbeddings
+            provider = get_provider()
+            _embeddings = CachedEmbeddings(provider.embeddings(EMBEDDING_MODEL), f"{provider.name}/{EMBEDDING_MODEL}", embedding_cache)
+        return _embeddings
+
+# Slow-to-import libraries that are otherwise loaded on the first vector store operation
+PREWARM_MODULES = ["faiss", "utils.vector_store"]
+
+def prewarm():
+    """Load the model SDK and vector store libraries and build the shared clients.
+
+    Everything here otherwise happens on the first AI request; app.py runs
+    it in a background thread when AI_PREWARM is set so that request does
+    not pay for it, without delaying startup.
+    """
+    started = time.monotonic()
+    try:
+        for module in PREWARM_MODULES:
+            importlib.import_module(module)
+        get_llm_client()
+        get_embeddings()
+        if VECTOR_INDEX_MODE == "shared":
+            _get_shared_index()
+        print(f"[AI] Prewarmed in {time.monotonic() - started:.2f}s")
+    except Exception as e:
+        print(f"[AI] Prewarm failed: {e}")
+
+# Translated chunks keyed by (model, chunk hash, language); kept until evicted
+translation_cache = TieredCache(
+    "translation_cache",
+    max_entries=int(os.getenv("TRANSLATION_CACHE_SIZE", "2048")),
+    ttl_seconds=int(os.getenv("TRANSLATION_CACHE_TTL", "0")) or None
+)
+
+# Chat answers per document version, shared by every user asking the same question
+answer_cache = AnswerCache(embed_query=lambda text: get_embeddings().embed_query(text))
 
 # Constants
-MAX_CONTEXT_SIZE = 30000  # Gemini's context limit
-CHUNK_SIZE = 4096
+CHUNK_SIZE = 4096  # Retrieval chunk size for vector stores
 CHUNK_OVERLAP = 512
+# Per-task chunk caps in tokens; tasks whose output grows with input need smaller chunks.
+# Summaries are uncapped by default (0), so a document that fits the model's window is one call
+SUMMARY_CHUNK_TOKENS = int(os.getenv("AI_SUMMARY_CHUNK_TOKENS", "0")) or None
+GRAPH_CHUNK_TOKENS = int(os.getenv("AI_GRAPH_CHUNK_TOKENS", "16000"))
+TRANSLATION_CHUNK_TOKENS = int(os.getenv("AI_TRANSLATION_CHUNK_TOKENS", "6000"))
+# Documents larger than this are answered from retrieved chunks instead of in full
+CHAT_CONTEXT_TOKENS = int(os.getenv("AI_CHAT_CONTEXT_TOKENS", "32000"))
+MAX_CONCURRENT_CHUNKS = int(os.getenv("AI_MAX_CONCURRENCY", "4"))  # Parallel chunk requests
+# Chunks sent to the model per chat question, and candidates taken from each ranking before fusion
+RETRIEVAL_K = 5
+RETRIEVAL_CANDIDATES = 20
+HYBRID_RETRIEVAL = os.getenv("AI_HYBRID_RETRIEVAL", "1").lower() not in ("0", "false", "no")
+LEXICAL_LOOKUP_PATTERN = re.compile(
+    r'\b(section|clause|article|schedule|exhibit|annex|appendix|paragraph)\s+\d|§\s*\d|"[^"]{2,}"|\b\d+(\.\d+)+\b',
+    re.IGNORECASE
+)
+
+# Responses are cached by a hash of (model, prompt, generation config)
+llm_cache = TieredCache(
+    "llm_cache",
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", "512")),
+    ttl_seconds=int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+    enabled=os.getenv("LLM_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+)
 
-def should_chunk_transcript(text):
-    """Determine if transcript needs chunking based on size"""
-    return len(text) > MAX_CONTEXT_SIZE
+def should_chunk_transcript(text, max_tokens=None):
+    """Determine if transcript needs chunking based on the model's token budget"""
+    return plan_document(text, LLM_MODEL, max_tokens).mode != "single"
 
-def chunk_transcript(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    """Only chunk if text is too large"""
-    if not should_chunk_transcript(text):
+def chunk_transcript(text, max_tokens=None, overlap=CHUNK_OVERLAP):
+    """Only chunk if text does not fit the token budget; chunks are sized to the budget"""
+    plan = plan_document(text, LLM_MODEL, max_tokens)
+    if plan.mode == "single":
         return [text]  # Return as single chunk
-        
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=overlap,
-        separators=["\n\n", "\n", ". ", " ", ""]
+    
+    return split_text(text, plan.chunk_size, overlap)
+
+def split_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Always split text into chunks of at most chunk_size characters"""
+    return [text[start:end] for start, end in iter_spans(text, chunk_size, overlap)]
+
+def _llm_cache_key(prompt, response_schema=None):
+    return make_cache_key(get_llm_client().config_key(response_schema), prompt)
+
+def _generate(prompt, use_cache=True, operation="default", response_schema=None):
+    """Generate text for a prompt, serving byte-identical requests from the cache"""
+    client = get_llm_client()
+    key = _llm_cache_key(prompt, response_schema)
+    return llm_cache.get_or_compute(
+        key,
+        lambda: client.generate(prompt, operation, response_schema=response_schema),
+        bypass=not use_cache
     )
-    return splitter.split_text(text)
 
-def create_vector_store(document_id: str, transcript: str):
-    """Create vector store for document content"""
+def _generate_json(prompt, validate, schema, use_cache=True, operation="default"):
+    """Generate a schema-constrained JSON response and return it parsed and validated.
+
+    Near-valid JSON is repaired locally instead of being thrown away. A
+    response that still cannot be used is evicted from the response cache
+    so the next attempt asks the model again, and StructuredOutputError is
+    raised.
+    """
+    response_text = _generate(prompt, use_cache=use_cache, operation=operation, response_schema=schema)
     try:
-        chunks = chunk_transcript(transcript)
+        return parse_json_response(response_text, operation, validate)
+    except StructuredOutputError:
+        llm_cache.delete(_llm_cache_key(prompt, schema))
+        raise
+
+def _map_chunks(fn, chunks, max_workers=MAX_CONCURRENT_CHUNKS, progress=None, total=None):
+    """Apply fn(index, chunk) to every chunk concurrently, keeping chunk order.
+
+    progress(done, total) is called as chunks finish; total defaults to the
+    number of chunks but callers can reserve extra steps for later stages.
+    """
+    total = total or len(chunks)
+    done = [0]
+    lock = threading.Lock()
+    
+    def run(i, chunk):
+        result = fn(i, chunk)
+        if progress:
+            with lock:
+                done[0] += 1
+                progress(done[0], total)
+        return result
+    
+    if len(chunks) <= 1 or max_workers <= 1:
+        return [run(i, chunk) for i, chunk in enumerate(chunks)]
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        return list(executor.map(run, range(len(chunks)), chunks))
+
+# Loaded FAISS indexes, shared by every request in this process
+vector_store_cache = LRUCache(
+    max_entries=int(os.getenv("VECTOR_STORE_CACHE_ENTRIES", "256")),
+    max_bytes=int(os.getenv("VECTOR_STORE_CACHE_MB", "512")) * 1024 * 1024,
+    sizeof=lambda entry: entry[1].nbytes(),
+    name="vector_stores"
+)
+
+# "per_document" keeps one FAISS directory per document; "shared" puts every
+# document's chunks into a few sharded HNSW indexes filtered at query time
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "per_document")
+# Map per-document indexes read-only so worker processes share their pages instead of each holding a copy
+VECTOR_STORE_MMAP = os.getenv("VECTOR_STORE_MMAP", "1").lower() not in ("0", "false", "no")
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+def _get_shared_index():
+    """Open the shared multi-document index on first use"""
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            from utils.shared_index import SharedVectorIndex
+            _shared_index = SharedVectorIndex(
+                "vector_stores/_shared",
+                num_shards=int(os.getenv("VECTOR_INDEX_SHARDS", "4"))
+            )
+        return _shared_index
+
+def _vector_store_mtime(document_id: str):
+    # The manifest is written last, so its mtime changes once per completed save
+    try:
+        return os.stat(f"vector_stores/{document_id}/manifest.json").st_mtime_ns
+    except OSError:
+        return None
+
+def _bm25_path(document_id: str):
+    return f"vector_stores/{document_id}/bm25.json"
+
+# Keyword indexes built next to each vector store, used for hybrid retrieval
+bm25_cache = LRUCache(
+    max_entries=int(os.getenv("BM25_CACHE_ENTRIES", "256")),
+    max_bytes=int(os.getenv("BM25_CACHE_MB", "256")) * 1024 * 1024,
+    sizeof=lambda index: index.nbytes(),
+    name="bm25_indexes"
+)
+
+def _save_bm25_index(document_id: str, chunks, generation):
+    index = BM25Index(chunks, generation=generation)
+    if VECTOR_INDEX_MODE == "shared":
+        # Kept in the shared database rather than as one file per document
+        _get_shared_index().save_keyword_index(document_id, index.dumps())
+    else:
+        index.save(_bm25_path(document_id))
+    bm25_cache.set(document_id, index)
+    return index
+
+def _read_bm25_index(document_id: str):
+    if VECTOR_INDEX_MODE == "shared":
+        data = _get_shared_index().load_keyword_index(document_id)
+        return BM25Index.loads(data) if data is not None else None
+    return BM25Index.load(_bm25_path(document_id))
+
+def load_bm25_index(document_id: str, vector_store):
+    """Keyword index over the vector store's current chunks.
+
+    Only postings are stored; hits are chunk ids whose text comes from
+    the vector store. An index that is missing, in an older format, or
+    built from another version of the store is rebuilt from the store's
+    chunks.
+    """
+    generation = vector_store.generation
+    index = bm25_cache.get(document_id)
+    if index is not None and index.generation == generation:
+        return index
+    
+    try:
+        index = _read_bm25_index(document_id)
+    except (OSError, ValueError):
+        index = None
+    if index is None or index.generation != generation:
+        texts = vector_store.chunk_texts()
+        index = _save_bm25_index(document_id, [texts[i] for i in range(len(texts))], generation)
+        print(f"[AI] Rebuilt keyword index for document {document_id}")
+        return index
+    
+    bm25_cache.set(document_id, index)
+    return index
+
+def _chunk_ids(chunks):
+    """Stable docstore ids derived from chunk content (repeated chunks get a counter)"""
+    ids = []
+    seen = {}
+    for chunk in chunks:
+        chunk_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+        occurrence = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = occurrence + 1
+        ids.append(f"{chunk_hash}:{occurrence}")
+    return ids
+
+def _embed_chunks(existing_store, chunks, ids, progress=None):
+    """Vectors for chunks, reusing the existing store's vector for every unchanged chunk.
+
+    Stored vectors are only reused when they came from the current embedding
+    model; otherwise every chunk is embedded again.
+    """
+    embeddings = get_embeddings()
+    reusable = {}
+    if existing_store:
+        if existing_store.embedding_model == embeddings.model_name:
+            reusable = existing_store.vectors_by_id()
+        else:
+            print(f"[AI] Vector store was embedded with {existing_store.embedding_model}, re-embedding with {embeddings.model_name}")
+    added = [i for i, doc_id in enumerate(ids) if doc_id not in reusable]
+    added_vectors = embeddings.embed_documents([chunks[i] for i in added], progress=progress) if added else []
+    
+    vectors = [reusable.get(doc_id) for doc_id in ids]
+    for i, vector in zip(added, added_vectors):
+        vectors[i] = vector
+    
+    if existing_store:
+        removed = len(set(reusable) - set(ids))
+        print(f"[AI] Vector store diff: {len(added)} added, {removed} removed, {len(ids) - len(added)} reused")
+    return vectors
+
+def create_vector_store(document_id: str, transcript: str, user_id: str = None, progress=None):
+    """Create or incrementally update the vector store for document content.
+
+    Embedding runs in batches (see utils/embeddings.py); progress(done, total)
+    is reported per finished batch.
+    """
+    try:
+        embeddings = get_embeddings()
+        # Retrieval needs small chunks regardless of whether the text fits one prompt
+        spans = list(iter_spans(transcript, CHUNK_SIZE, CHUNK_OVERLAP))
+        chunks = [transcript[start:end] for start, end in spans]
+        ids = _chunk_ids(chunks)
+        # Offsets locate each chunk in the source text
+        metadatas = [
+            {"document_id": document_id, "chunk_id": i, "chunk_hash": ids[i].split(':')[0], "start": start, "end": end}
+            for i, (start, end) in enumerate(spans)
+        ]
+        
+        if VECTOR_INDEX_MODE == "shared":
+            # Unchanged chunks are served from the embedding cache
+            index = _get_shared_index()
+            index.replace_document(
+                document_id, user_id, chunks, metadatas,
+                embeddings.embed_documents(chunks, progress=progress)
+            )
+            from utils.shared_index import SharedIndexView
+            view = SharedIndexView(index, document_id, embeddings)
+            _save_bm25_index(document_id, chunks, view.generation)
+            return view
         
         # Create directory if it doesn't exist
         os.makedirs("vector_stores", exist_ok=True)
         
-        # Create FAISS vector store
-        vector_store = FAISS.from_texts(
-            chunks,
-            embeddings,
-            metadatas=[{"document_id": document_id, "chunk_id": i} for i in range(len(chunks))]
-        )
+        # Unchanged chunks keep their stored vectors; only new ones are embedded
+        existing_store = load_vector_store(document_id, use_cache=False) if vector_store_exists(document_id) else None
+        vectors = _embed_chunks(existing_store, chunks, ids, progress)
         
-        # Save vector store
-        vector_store.save_local(f"vector_stores/{document_id}")
+        # Chunk text is not stored separately: rows hold offsets into the saved transcript
+        from utils.vector_store import DocumentVectorStore
+        vector_store = DocumentVectorStore.build(
+            f"vector_stores/{document_id}", document_id, transcript, spans, vectors, embeddings
+        )
+        vector_store_cache.set(document_id, (_vector_store_mtime(document_id), vector_store))
+        _save_bm25_index(document_id, chunks, vector_store.generation)
         print(f"[AI] Vector store created and saved for document {document_id}")
         return vector_store
     except Exception as e:
         print(f"[AI] Error creating vector store: {e}")
         raise e
 
-def load_vector_store(document_id: str):
-    """Load existing vector store"""
+def vector_store_exists(document_id: str):
+    """Check whether a vector store has been saved for a document"""
+    if VECTOR_INDEX_MODE == "shared":
+        return _get_shared_index().has_document(document_id)
+    from utils.vector_store import DocumentVectorStore
+    path = f"vector_stores/{document_id}"
+    return DocumentVectorStore.exists(path) or DocumentVectorStore.is_legacy(path)
+
+def load_vector_store(document_id: str, use_cache=True):
+    """Load existing vector store, from the in-process cache when it is still current"""
+    if VECTOR_INDEX_MODE == "shared":
+        from utils.shared_index import SharedIndexView
+        index = _get_shared_index()
+        return SharedIndexView(index, document_id, get_embeddings()) if index.has_document(document_id) else None
+    
+    from utils.vector_store import DocumentVectorStore, migrate_legacy_store
+    path = f"vector_stores/{document_id}"
+    if DocumentVectorStore.is_legacy(path):
+        # Stores saved by LangChain's FAISS.save_local are converted once, on first load
+        try:
+            migrate_legacy_store(path, document_id=document_id)
+            print(f"[AI] Converted legacy vector store for document {document_id}")
+        except Exception as e:
+            print(f"[AI] Could not convert legacy vector store for document {document_id}: {e}")
+            return None
+    
+    mtime = _vector_store_mtime(document_id)
+    if use_cache:
+        entry = vector_store_cache.get(document_id)
+        # Another worker may have rewritten the store on disk since we cached it
+        if entry and entry[0] == mtime:
+            return entry[1]
+    
     try:
-        vector_store = FAISS.load_local(f"vector_stores/{document_id}", embeddings, allow_dangerous_deserialization=True)
+        vector_store = DocumentVectorStore.load(path, get_embeddings(), mmap=VECTOR_STORE_MMAP)
         print(f"[AI] Vector store loaded for document {document_id}")
+        if use_cache:
+            vector_store_cache.set(document_id, (mtime, vector_store))
         return vector_store
     except Exception as e:
         print(f"[AI] Could not load vector store for document {document_id}: {e}")
         return None
 
-def generate_simple_chat_response(question, transcript):
-    """Generate a simple chat response using Gemini for smaller transcripts"""
-    try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        
-        prompt = f"""You are an AI assistant helping users understand their document content. 
+def invalidate_vector_store(document_id: str, remove_files=False):
+    """Drop a document's vector store from the cache, and optionally from disk"""
+    vector_store_cache.delete(document_id)
+    bm25_cache.delete(document_id)
+    if remove_files and VECTOR_INDEX_MODE == "shared":
+        _get_shared_index().delete_document(document_id)
+    elif remove_files:
+        shutil.rmtree(f"vector_stores/{document_id}", ignore_errors=True)
+
+def _simple_chat_prompt(question, transcript):
+    return f"""You are an AI assistant helping users understand their document content. 
 
 Document Content:
 {transcript}
@@ -88,20 +416,157 @@ Instructions:
 - Use a friendly, professional tone
 
 Answer:"""
+
+def _document_qa_prompt(question, context):
+    return f"""You are an AI document assistant. Based on the following document context, answer the user's question accurately and concisely.
+
+Context from document:
+{context}
+
+Question: {question}
+
+Instructions:
+- Answer based only on the provided context
+- If the answer is not in the context, say "I don't have enough information in the document to answer that question."
+- Be specific and cite relevant parts of the document
+- Keep answers concise but informative"""
+
+def is_lexical_lookup(question):
+    """Whether a question names an exact reference, such as a section number or a quoted term"""
+    return bool(LEXICAL_LOOKUP_PATTERN.search(question))
+
+def _retrieve_context(document_id, question, vector_store=None):
+    """Return the most relevant chunks for a question, or None without a vector store.
+
+    Keyword (BM25) and vector rankings are merged by reciprocal rank
+    fusion. Questions that name an exact reference are answered from the
+    keyword index alone, without embedding the question.
+    """
+    if vector_store is None:
+        vector_store = load_vector_store(document_id)
+    
+    if not vector_store:
+        return None
+    
+    bm25 = load_bm25_index(document_id, vector_store) if HYBRID_RETRIEVAL else None
+    keyword_hits = [i for i, _ in bm25.search(question, RETRIEVAL_CANDIDATES)] if bm25 else []
+    
+    if keyword_hits and is_lexical_lookup(question):
+        texts = vector_store.chunk_texts(keyword_hits[:RETRIEVAL_K])
+        return "\n".join(texts[i] for i in keyword_hits[:RETRIEVAL_K] if i in texts)
+    
+    # Find relevant chunks
+    relevant_docs = vector_store.similarity_search(question, k=RETRIEVAL_CANDIDATES if keyword_hits else RETRIEVAL_K)
+    if not keyword_hits:
+        return "\n".join([doc.page_content for doc in relevant_docs])
+    
+    texts = {}
+    vector_ranking = []
+    for doc in relevant_docs:
+        chunk_id = doc.metadata.get("chunk_id")
+        texts[chunk_id] = doc.page_content
+        vector_ranking.append(chunk_id)
+    
+    fused = reciprocal_rank_fusion([vector_ranking, keyword_hits])[:RETRIEVAL_K]
+    # Only keyword hits that made the cut and were not already returned by the vector search are read
+    texts.update(vector_store.chunk_texts([chunk_id for chunk_id in fused if chunk_id not in texts]))
+    return "\n".join(texts[chunk_id] for chunk_id in fused if chunk_id in texts)
+
+def needs_retrieval(transcript):
+    """Whether a document is too large to send in full with every chat question"""
+    return not fits_in_context(transcript, CHAT_CONTEXT_TOKENS, LLM_MODEL)
+
+def truncate_for_chat(transcript):
+    """Cut a document down to roughly the chat context budget"""
+    limit = CHAT_CONTEXT_TOKENS * CHARS_PER_TOKEN
+    return transcript if len(transcript) <= limit else transcript[:limit] + "..."
+
+CHAT_UNAVAILABLE_MESSAGE = "I'm having trouble processing your question right now. Please try again."
+VECTOR_STORE_MISSING_MESSAGE = "Vector store not found. Please process the document first."
+
+def answer_fingerprint(document_id, content):
+    """Answer cache namespace for one version of a document under the current model"""
+    return AnswerCache.fingerprint(document_id, content, get_llm_client().config_key())
+
+def is_cacheable_answer(answer):
+    """Error and placeholder replies must not be served to the next user"""
+    return bool(answer) and answer not in (CHAT_UNAVAILABLE_MESSAGE, VECTOR_STORE_MISSING_MESSAGE)
+
+def generate_simple_chat_response(question, transcript, use_cache=True):
+    """Generate a simple chat response using Gemini for smaller transcripts"""
+    try:
+        return _generate(_simple_chat_prompt(question, transcript), use_cache=use_cache, operation="chat")
         
-        response = model.generate_content(prompt)
-        return response.text
-        
+    except CircuitOpenError:
+        # Callers answer 503 instead of a chat message
+        raise
     except Exception as e:
         print(f"[AI] Simple chat response error: {str(e)}")
-        return "I'm having trouble processing your question right now. Please try again."
+        return CHAT_UNAVAILABLE_MESSAGE
+
+def _batch_by_budget(texts, max_tokens):
+    """Group consecutive texts into batches whose estimated size fits max_tokens"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        # Every batch takes at least two texts so each level shrinks the list
+        if len(current) >= 2 and current_tokens + tokens > max_tokens:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
 
-def generate_summary(transcript):
-    """Generate document summary - only chunk if necessary"""
-    if not should_chunk_transcript(transcript):
+def _reduce_summaries(summaries, use_cache=True, checkpoint=None, level=0):
+    """Tree-reduce partial summaries until they fit into one final prompt.
+
+    Each level groups summaries into budget-sized batches and condenses the
+    batches in parallel. Completed levels are saved to the checkpoint.
+    """
+    max_tokens = context_budget(LLM_MODEL)
+    if SUMMARY_CHUNK_TOKENS:
+        max_tokens = min(max_tokens, SUMMARY_CHUNK_TOKENS)
+    
+    while len(summaries) > 1 and sum(estimate_tokens(s) for s in summaries) > max_tokens:
+        batches = _batch_by_budget(summaries, max_tokens)
+        
+        def reduce_batch(i, batch):
+            # A lone trailing summary is already condensed; another call would only paraphrase it
+            if len(batch) == 1:
+                return batch[0]
+            return _generate(
+                f"""Combine these partial summaries of consecutive parts of one document ({i+1}/{len(batches)}) into a single consolidated partial summary.
+            Keep all key points, topics, findings, entities and notable quotes, and remove duplicates.
+            
+            {chr(10).join(batch)}""",
+                use_cache=use_cache, operation="summary_reduce"
+            )
+        
+        summaries = _map_chunks(reduce_batch, batches)
+        level += 1
+        print(f"[AI] Summary reduce level {level}: {len(summaries)} partial summaries")
+        if checkpoint:
+            checkpoint['save'](level, summaries)
+    
+    return summaries
+
+def generate_summary(transcript, use_cache=True, progress=None, checkpoint=None):
+    """Generate document summary - only chunk if necessary.
+
+    checkpoint, if given, is a dict with 'load()' and 'save(state)' callables
+    used to persist each completed level, so a rerun after a failure
+    resumes from the last saved level.
+    """
+    plan = plan_document(transcript, LLM_MODEL, SUMMARY_CHUNK_TOKENS)
+    print(f"[AI] Summary plan: {plan.mode} (~{plan.tokens} tokens, {plan.chunk_count} chunks)")
+    
+    if plan.mode == "single":
         # Process as single document
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(
+        return _generate(
             f"""Analyze this document and provide a comprehensive summary:
 
 Document: {transcript}
@@ -114,30 +579,62 @@ Provide:
 5. **Recommendations** (if any)
 6. **Important Quotes** (if any stand out)
 
-Format the response clearly with headers and bullet points."""
+Format the response clearly with headers and bullet points.""",
+            use_cache=use_cache, operation="summary_chunk"
         )
-        return response.text
     
-    # Handle large transcripts with chunking
-    chunks = chunk_transcript(transcript)
-    summaries = []
+    summaries = _partial_summaries(transcript, plan, use_cache, progress, checkpoint)
+    return _combine_summaries(summaries, use_cache)
+
+def _partial_summaries(transcript, plan, use_cache=True, progress=None, checkpoint=None):
+    """Map-reduce a document that does not fit one prompt down to partial summaries that do.
+
+    Shared by every whole-document task (summary, insights), so the chunk
+    summaries one task generated are cache hits for the next. progress
+    reserves one extra step for the caller's final combine.
+    """
+    # Intermediate levels are tagged with a fingerprint of the content, model configuration,
+    # chunking and cache mode, so partials from another version or a non-refresh run are ignored
+    transcript_hash = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+    checkpoint_key = make_cache_key(transcript_hash, get_llm_client().config_key(), plan.chunk_size, use_cache)
+    
+    def save_level(level, level_summaries):
+        checkpoint['save']({'key': checkpoint_key, 'level': level, 'summaries': level_summaries})
     
-    for i, chunk in enumerate(chunks):
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(
+    level_checkpoint = {'save': save_level} if checkpoint else None
+    
+    # Resume from the last completed level if this transcript was partly processed
+    saved = checkpoint['load']() if checkpoint else None
+    if saved and saved.get('key') == checkpoint_key:
+        print(f"[AI] Resuming from reduce level {saved['level']}")
+        return _reduce_summaries(saved['summaries'], use_cache, level_checkpoint, saved['level'])
+    
+    # Handle large transcripts with chunking - summarize chunks in parallel
+    chunks = split_text(transcript, plan.chunk_size)
+    
+    def summarize_chunk(i, chunk):
+        return _generate(
             f"""Analyze this document chunk ({i+1}/{len(chunks)}) and provide:
             1. Key points discussed
             2. Main topics covered
             3. Important findings
             4. Key entities mentioned
             
-            Document chunk: {chunk}"""
+            Document chunk: {chunk}""",
+            use_cache=use_cache, operation="summary_chunk"
         )
-        summaries.append(response.text)
     
-    # Combine chunk summaries
-    final_model = genai.GenerativeModel("gemini-1.5-flash")
-    final_summary = final_model.generate_content(
+    # The final combine step counts as one more unit of progress
+    summaries = _map_chunks(summarize_chunk, chunks, progress=progress, total=len(chunks) + 1)
+    if level_checkpoint:
+        level_checkpoint['save'](0, summaries)
+    
+    # Very large documents need several levels before the final combine
+    return _reduce_summaries(summaries, use_cache, level_checkpoint)
+
+def _combine_summaries(summaries, use_cache=True):
+    """Final reduce step: merge partial summaries into the document summary"""
+    return _generate(
         f"""Create a comprehensive document summary from these chunk summaries:
         
         {chr(10).join(summaries)}
@@ -150,41 +647,114 @@ Format the response clearly with headers and bullet points."""
         5. **Recommendations** (consolidated)
         6. **Important Quotes** (best ones from all chunks)
         
-        Format clearly with headers and remove any duplicates."""
+        Format clearly with headers and remove any duplicates.""",
+        use_cache=use_cache, operation="summary_reduce"
     )
-    return final_summary.text
 
-def chatbot_answer(document_id: str, question: str):
+def chatbot_answer(document_id: str, question: str, use_cache=True, vector_store=None):
     """Answer questions using vector similarity search for large documents"""
     try:
-        vector_store = load_vector_store(document_id)
+        context = _retrieve_context(document_id, question, vector_store)
         
-        if not vector_store:
-            return "Vector store not found. Please process the document first."
+        if context is None:
+            return VECTOR_STORE_MISSING_MESSAGE
         
-        # Find relevant chunks
-        relevant_docs = vector_store.similarity_search(question, k=5)
-        context = "\n".join([doc.page_content for doc in relevant_docs])
-        
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        prompt = f"""You are an AI document assistant. Based on the following document context, answer the user's question accurately and concisely.
+        return _generate(_document_qa_prompt(question, context), use_cache=use_cache, operation="chat")
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"[AI] Chatbot answer error: {e}")
+        return CHAT_UNAVAILABLE_MESSAGE
 
-Context from document:
-{context}
+def _suggestion_context(questions, transcript):
+    """Document text for answering several questions in one prompt.
 
-Question: {question}
+    Small documents are sent whole; larger ones contribute the chunks
+    that rank best for any of the questions on a throwaway keyword index,
+    so no vector store or embedding call is needed.
+    """
+    if not needs_retrieval(transcript):
+        return transcript
+    
+    chunks = split_text(transcript)
+    index = BM25Index(chunks)
+    # Interleave each question's best chunks so every question gets some context
+    rankings = [[i for i, _ in index.search(question, RETRIEVAL_CANDIDATES)] for question in questions]
+    selected, seen, budget = [], set(), CHAT_CONTEXT_TOKENS
+    for rank in range(RETRIEVAL_CANDIDATES):
+        for ranking in rankings:
+            if rank < len(ranking) and ranking[rank] not in seen:
+                cost = estimate_tokens(chunks[ranking[rank]])
+                if cost > budget:
+                    continue
+                seen.add(ranking[rank])
+                selected.append(ranking[rank])
+                budget -= cost
+    return "\n...\n".join(chunks[i] for i in sorted(selected)) or truncate_for_chat(transcript)
+
+def answer_suggested_questions(questions, transcript, use_cache=True):
+    """Answer a list of questions about a document in one model call; returns {question: answer}"""
+    numbered = "\n".join(f"{i+1}. {question}" for i, question in enumerate(questions))
+    prompt = f"""You are an AI assistant helping users understand their document content.
+
+Document Content:
+{_suggestion_context(questions, transcript)}
+
+Answer each of these questions about the document:
+{numbered}
 
 Instructions:
-- Answer based only on the provided context
-- If the answer is not in the context, say "I don't have enough information in the document to answer that question."
-- Be specific and cite relevant parts of the document
-- Keep answers concise but informative"""
+- Answer based only on the provided document content
+- If the answer isn't in the document, say so clearly
+- Keep each answer concise but informative
 
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        print(f"[AI] Chatbot answer error: {e}")
-        return "I'm having trouble processing your question right now. Please try again."
+Return ONLY valid JSON in this exact format, with one entry per question in the same order:
+{{"answers": [{{"question": "<question>", "answer": "<answer>"}}]}}"""
+    
+    answers = _generate_json(prompt, validate_answers, ANSWERS_SCHEMA, use_cache=use_cache, operation="suggestions")
+    
+    # Match answers by the question they echo, not by position; the model may skip or reorder entries
+    requested = {normalize_question(question): question for question in questions}
+    results = {}
+    for item in answers:
+        if not isinstance(item, dict) or not isinstance(item.get("question"), str):
+            continue
+        question = requested.get(normalize_question(item["question"]))
+        answer = item.get("answer")
+        if question and question not in results and isinstance(answer, str) and answer.strip():
+            results[question] = answer.strip()
+    return results
+
+def _generate_stream(prompt, use_cache=True, operation="chat"):
+    """Yield response text as Gemini streams it, caching the completed answer"""
+    client = get_llm_client()
+    key = make_cache_key(client.config_key(), prompt)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    
+    parts = []
+    for text in client.stream(prompt, operation):
+        parts.append(text)
+        yield text
+    
+    llm_cache.set(key, "".join(parts) or None)
+
+def stream_simple_chat_response(question, transcript, use_cache=True):
+    """Streaming variant of generate_simple_chat_response"""
+    yield from _generate_stream(_simple_chat_prompt(question, transcript), use_cache=use_cache)
+
+def stream_chatbot_answer(document_id: str, question: str, use_cache=True, vector_store=None):
+    """Streaming variant of chatbot_answer"""
+    context = _retrieve_context(document_id, question, vector_store)
+    
+    if context is None:
+        yield VECTOR_STORE_MISSING_MESSAGE
+        return
+    
+    yield from _generate_stream(_document_qa_prompt(question, context), use_cache=use_cache)
 
 def identify_speakers(transcript_segments):
     """Identify different speakers in transcript segments"""
@@ -204,25 +774,29 @@ def identify_speakers(transcript_segments):
         
     return speakers
 
-def generate_knowledge_graph(transcript):
+def generate_knowledge_graph(transcript, use_cache=True, progress=None):
     """Generate knowledge graph from document content"""
     # Only chunk if necessary for knowledge graph extraction
-    if should_chunk_transcript(transcript):
+    if should_chunk_transcript(transcript, GRAPH_CHUNK_TOKENS):
         # For large transcripts, extract entities from chunks then combine
-        chunks = chunk_transcript(transcript)
+        chunks = chunk_transcript(transcript, GRAPH_CHUNK_TOKENS)
         all_entities = []
         all_relationships = []
         
-        for chunk in chunks:
-            chunk_graph = _extract_entities_from_chunk(chunk)
+        # Chunks are extracted concurrently; results come back in chunk order
+        chunk_graphs = _map_chunks(
+            lambda i, chunk: _extract_entities_from_chunk(chunk, use_cache=use_cache),
+            chunks,
+            progress=progress
+        )
+        for chunk_graph in chunk_graphs:
             if chunk_graph and 'nodes' in chunk_graph:
                 all_entities.extend(chunk_graph['nodes'])
             if chunk_graph and 'edges' in chunk_graph:
                 all_relationships.extend(chunk_graph['edges'])
         
-        # Deduplicate and combine
-        unique_entities = _deduplicate_entities(all_entities)
-        unique_relationships = _deduplicate_relationships(all_relationships)
+        # Merge entities named differently across chunks and point edges at the merged nodes
+        unique_entities, unique_relationships = resolve_entities(all_entities, all_relationships)
         
         return {
             "nodes": unique_entities,
@@ -232,12 +806,12 @@ def generate_knowledge_graph(transcript):
         }
     else:
         # Process as single document
-        return _extract_entities_from_chunk(transcript)
+        graph = _extract_entities_from_chunk(transcript, use_cache=use_cache)
+        graph['nodes'], graph['edges'] = resolve_entities(graph.get('nodes', []), graph.get('edges', []))
+        return graph
 
-def _extract_entities_from_chunk(text):
+def _extract_entities_from_chunk(text, use_cache=True):
     """Extract entities from a single chunk"""
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    
     prompt = f"""Analyze this document and extract a knowledge graph in JSON format.
 
 Text: {text}
@@ -253,10 +827,10 @@ Extract entities and relationships to create a knowledge graph. Focus on:
 Return ONLY valid JSON in this exact format:
 {{
     "nodes": [
-        {{"id": "person_john_doe", "label": "John Doe", "type": "person", "properties": {{"role": "author", "expertise": "AI"}}}},
-        {{"id": "project_alpha", "label": "Project Alpha", "type": "project", "properties": {{"status": "active", "domain": "research"}}}},
-        {{"id": "topic_budget", "label": "Budget Planning", "type": "topic", "properties": {{"category": "finance"}}}},
-        {{"id": "finding_key", "label": "Key Finding", "type": "finding", "properties": {{"importance": "high", "validated": "true"}}}}
+        {{"id": "person_john_doe", "label": "John Doe", "type": "person", "properties": [{{"key": "role", "value": "author"}}, {{"key": "expertise", "value": "AI"}}]}},
+        {{"id": "project_alpha", "label": "Project Alpha", "type": "project", "properties": [{{"key": "status", "value": "active"}}, {{"key": "domain", "value": "research"}}]}},
+        {{"id": "topic_budget", "label": "Budget Planning", "type": "topic", "properties": [{{"key": "category", "value": "finance"}}]}},
+        {{"id": "finding_key", "label": "Key Finding", "type": "finding", "properties": [{{"key": "importance", "value": "high"}}, {{"key": "validated", "value": "true"}}]}}
     ],
     "edges": [
         {{"source": "person_john_doe", "target": "project_alpha", "relationship": "leads", "weight": 1.0}},
@@ -274,55 +848,35 @@ Make sure to:
 - Include diverse entity types (person, project, topic, finding, company, technology)
 - Create logical relationships between entities
 - Extract realistic action items with assignees when possible
-- Include relevant properties for each entity"""
+- Include relevant properties for each entity, as a list of key/value pairs"""
     
     try:
-        response = model.generate_content(prompt)
-        
-        # Clean the response to extract JSON
-        json_text = response.text.strip()
-        
-        # Remove markdown code block markers
-        if json_text.startswith('```json'):
-            json_text = json_text[7:]
-        elif json_text.startswith('```'):
-            json_text = json_text[3:]
-        
-        if json_text.endswith('```'):
-            json_text = json_text[:-3]
-        
-        # Parse JSON
-        result = json.loads(json_text)
-        
-        # Validate and fix the structure
-        if not isinstance(result, dict):
-            return _create_fallback_graph(text)
-        
-        # Ensure all required keys exist
-        result.setdefault('nodes', [])
-        result.setdefault('edges', [])
-        result.setdefault('topics', [])
-        result.setdefault('action_items', [])
-        
-        return result
-        
+        # Constrained to GRAPH_SCHEMA; validate_graph fills in missing keys and drops unusable entries
+        return _generate_json(prompt, validate_graph, GRAPH_SCHEMA, use_cache=use_cache, operation="graph")
     except Exception as e:
         print(f"[AI] Knowledge graph extraction error: {e}")
         return _create_fallback_graph(text)
 
+# Keyword lists for the local (no model) extraction passes
+PEOPLE_INDICATORS = ['said', 'mentioned', 'asked', 'replied', 'stated', 'speaker']
+PROJECT_INDICATORS = ['project', 'initiative', 'product', 'system', 'platform']
+COMMON_TOPICS = ['research', 'analysis', 'findings', 'methodology', 'conclusion', 'recommendation']
+ACTION_KEYWORDS = ['action item', 'todo', 'follow up', 'assign', 'due', 'deadline']
+
+fallback_graph_matcher = KeywordMatcher(PEOPLE_INDICATORS + PROJECT_INDICATORS + COMMON_TOPICS)
+action_item_matcher = KeywordMatcher(ACTION_KEYWORDS)
+
 def _create_fallback_graph(text):
     """Create a simple fallback graph when parsing fails"""
-    # Extract basic information
-    words = text.split()
-    people_indicators = ['said', 'mentioned', 'asked', 'replied', 'stated', 'Speaker']
-    projects_indicators = ['project', 'initiative', 'product', 'system', 'platform']
+    # One scan finds every indicator and topic word
+    found = fallback_graph_matcher.matched(text)
     
     nodes = []
     edges = []
     topics = []
     
     # Create generic nodes
-    if any(indicator in text.lower() for indicator in people_indicators):
+    if found.intersection(PEOPLE_INDICATORS):
         nodes.append({
             "id": "generic_participant",
             "label": "Document Author",
@@ -330,7 +884,7 @@ def _create_fallback_graph(text):
             "properties": {"role": "participant"}
         })
     
-    if any(indicator in text.lower() for indicator in projects_indicators):
+    if found.intersection(PROJECT_INDICATORS):
         nodes.append({
             "id": "generic_project",
             "label": "Discussed Project",
@@ -339,9 +893,8 @@ def _create_fallback_graph(text):
         })
     
     # Extract topics from common words
-    common_topics = ['research', 'analysis', 'findings', 'methodology', 'conclusion', 'recommendation']
-    for topic in common_topics:
-        if topic in text.lower():
+    for topic in COMMON_TOPICS:
+        if topic in found:
             topics.append(topic)
     
     return {
@@ -352,36 +905,11 @@ def _create_fallback_graph(text):
     }
 
 def _deduplicate_entities(entities):
-    """Remove duplicate entities based on label similarity"""
+    """Remove duplicate entities, merging different names for the same entity"""
     if not entities:
         return []
     
-    unique_entities = []
-    seen_labels = set()
-    
-    for entity in entities:
-        label_lower = entity.get('label', '').lower()
-        if label_lower not in seen_labels:
-            unique_entities.append(entity)
-            seen_labels.add(label_lower)
-    
-    return unique_entities
-
-def _deduplicate_relationships(relationships):
-    """Remove duplicate relationships"""
-    if not relationships:
-        return []
-    
-    unique_relationships = []
-    seen_relationships = set()
-    
-    for rel in relationships:
-        rel_key = (rel.get('source'), rel.get('target'), rel.get('relationship'))
-        if rel_key not in seen_relationships:
-            unique_relationships.append(rel)
-            seen_relationships.add(rel_key)
-    
-    return unique_relationships
+    return resolve_entities(entities)[0]
 
 def _extract_topics_from_entities(entities):
     """Extract topics from entity list"""
@@ -393,59 +921,112 @@ def _extract_topics_from_entities(entities):
 
 def _extract_action_items(transcript):
     """Extract action items from transcript"""
-    # Simple action item extraction
-    action_keywords = ['action item', 'todo', 'follow up', 'assign', 'due', 'deadline']
-    lines = transcript.split('\n')
-    
+    # Simple action item extraction - a single scan that stops after 5 matching lines
     action_items = []
-    for line in lines:
-        if any(keyword in line.lower() for keyword in action_keywords):
-            action_items.append({
-                "task": line.strip(),
-                "assignee": "TBD",
-                "due_date": "TBD",
-                "priority": "medium"
-            })
-    
-    return action_items[:5]  # Return max 5 action items
-
-def translate_transcript(transcript, target_language):
-    """Translate document content to target language"""
-    if should_chunk_transcript(transcript):
-        chunks = chunk_transcript(transcript)
-        translated_chunks = []
-        
-        for chunk in chunks:
-            model = genai.GenerativeModel("gemini-1.5-flash")
-            response = model.generate_content(
-                f"Translate this document to {target_language}:\n\n{chunk}"
-            )
-            translated_chunks.append(response.text)
-        
-        return '\n\n'.join(translated_chunks)
-    else:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(
-            f"Translate this document to {target_language}:\n\n{transcript}"
-        )
-        return response.text
+    for start, end in action_item_matcher.matching_lines(transcript, limit=5):
+        action_items.append({
+            "task": transcript[start:end].strip(),
+            "assignee": "TBD",
+            "due_date": "TBD",
+            "priority": "medium"
+        })
+    
+    return action_items
+
+def _translation_key(chunk, target_language):
+    chunk_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+    return make_cache_key(get_llm_client().config_key(), chunk_hash, target_language.strip().lower())
 
-def generate_document_insights(transcript):
-    """Generate additional insights about the document"""
-    model = genai.GenerativeModel("gemini-1.5-flash")
+def translate_document(transcript, target_language, use_cache=True, progress=None):
+    """Translate content chunk by chunk; returns a manifest of (cache key, text before the chunk) pairs.
+
+    Chunk boundaries depend only on nearby content (see
+    iter_content_defined_spans), and every translated chunk is stored in
+    translation_cache under (chunk hash, language), so translating an
+    edited document only sends the chunks that changed. Uncached chunks
+    are translated concurrently.
+    """
+    max_chars = int(min(context_budget(LLM_MODEL), TRANSLATION_CHUNK_TOKENS) * CHARS_PER_TOKEN * 0.9)
+    spans = list(iter_content_defined_spans(transcript, max_chars, max_chars // 2))
+    
+    manifest = []
+    previous_end = 0
+    for start, end in spans:
+        manifest.append((_translation_key(transcript[start:end], target_language), transcript[previous_end:start]))
+        previous_end = end
+    
+    cached = translation_cache.get_many([key for key, _ in manifest]) if use_cache else {}
+    missing = {}
+    for (key, _), (start, end) in zip(manifest, spans):
+        if key not in cached:
+            missing.setdefault(key, transcript[start:end])
+    print(f"[AI] Translation to {target_language}: {len(missing)} of {len(spans)} chunks need translating")
     
-    prompt = f"""Analyze this document and provide insights:
+    def translate_chunk(i, key):
+        translated = _generate(
+            f"Translate this document to {target_language}. Keep the formatting and return only the translation:\n\n{missing[key]}",
+            use_cache=use_cache, operation="translate"
+        )
+        translation_cache.set(key, translated)
+        return translated
+    
+    _map_chunks(translate_chunk, list(missing), progress=progress)
+    return manifest
 
-{transcript}
+def assemble_translation(manifest):
+    """Rebuild translated text from a manifest, or None if a chunk is no longer cached"""
+    translated = translation_cache.get_many([key for key, _ in manifest])
+    if len(translated) < len({key for key, _ in manifest}):
+        return None
+    return ''.join(gap + translated[key] for key, gap in manifest)
 
-Provide:
+def translate_transcript(transcript, target_language, use_cache=True, progress=None):
+    """Translate document content to target language"""
+    return assemble_translation(translate_document(transcript, target_language, use_cache, progress))
+
+INSIGHTS_SECTIONS = """Provide:
 1. **Document Quality Score** (1-10 with reasoning)
 2. **Content Analysis** (main themes, writing style, structure)
 3. **Key Insights** (most important findings or conclusions)
 4. **Recommendations** (suggested improvements or applications)
-5. **Document Metrics** (length, complexity, readability, etc.)
+
+The document metrics below were measured exactly; refer to them where useful but do not recompute them.
 
 Format as structured text with clear sections."""
+
+def generate_document_insights(transcript, use_cache=True, progress=None, checkpoint=None):
+    """Generate insights about the document: measured metrics plus a qualitative analysis.
+
+    Metrics are computed locally (utils/metrics.py). Documents that do not
+    fit one prompt go through the same map-reduce as generate_summary.
+    Returns {'metrics': {...}, 'insights': text}.
+    """
+    metrics = compute_document_metrics(transcript)
+    metrics_text = "\n".join(f"- {name}: {value}" for name, value in metrics.items())
+    plan = plan_document(transcript, LLM_MODEL, SUMMARY_CHUNK_TOKENS)
+    print(f"[AI] Insights plan: {plan.mode} (~{plan.tokens} tokens, {plan.chunk_count} chunks)")
+    
+    if plan.mode == "single":
+        prompt = f"""Analyze this document and provide insights:
+
+{transcript}
+
+{INSIGHTS_SECTIONS}
+
+Document metrics:
+{metrics_text}"""
+    else:
+        summaries = _partial_summaries(transcript, plan, use_cache, progress, checkpoint)
+        prompt = f"""Analyze this document and provide insights. The document is too long to include, so it is given as consecutive partial summaries:
+
+{chr(10).join(summaries)}
+
+{INSIGHTS_SECTIONS}
+
+Document metrics:
+{metrics_text}"""
     
-    response = model.generate_content(prompt)
-    return response.text
\ No newline at end of file
+    return {
+        'metrics': metrics,
+        'insights': _generate(prompt, use_cache=use_cache, operation="insights")
+    }
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import re
+import numpy as np
+from utils.cache import TieredCache, make_cache_key
+
+# Cosine similarity above which a differently worded question reuses an answer; 0 disables it
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+# Questions remembered per document version for near-duplicate matching
+ANSWER_CACHE_SEMANTIC_ENTRIES = int(os.getenv("ANSWER_CACHE_SEMANTIC_ENTRIES", "200"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(30 * 24 * 3600)))
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+class AnswerCache:
+    """Per-document cache of chatbot answers.
+
+    Entries are keyed by a fingerprint of the document content and model
+    configuration, so editing a document (or switching models) makes its
+    old answers unreachable without explicit invalidation. Lookups match
+    the normalised question exactly and, when a similarity threshold is
+    set, fall back to the closest earlier question by embedding cosine.
+    """
+
+    def __init__(self, embed_query=None, similarity=ANSWER_CACHE_SIMILARITY,
+                 max_semantic_entries=ANSWER_CACHE_SEMANTIC_ENTRIES, ttl_seconds=ANSWER_CACHE_TTL):
+        self.embed_query = embed_query
+        self.similarity = similarity
+        self.max_semantic_entries = max_semantic_entries
+        self.exact = TieredCache("answer_cache", max_entries=4096, ttl_seconds=ttl_seconds)
+        # One entry per document version holding [{question, vector, answer}]
+        self.semantic = TieredCache("answer_cache_semantic", max_entries=256, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def fingerprint(document_id, content, config_key=""):
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        return make_cache_key(document_id, content_hash, config_key)
+
+    def _semantic_enabled(self):
+        return bool(self.similarity and self.embed_query)
+
+    def lookup(self, fingerprint, question):
+        """Return (answer, match) with match "exact" or "semantic", or None on a miss"""
+        normalized = normalize_question(question)
+        entry = self.exact.get(make_cache_key(fingerprint, normalized))
+        if entry is not None:
+            return entry["answer"], "exact"
+
+        if not self._semantic_enabled():
+            return None
+        entries = self.semantic.get(fingerprint)
+        if not entries:
+            return None
+
+        # A failing embedding service must not fail the chat request; answer it as a miss
+        try:
+            query = np.asarray(self.embed_query(normalized), dtype="float32")
+        except Exception as e:
+            print(f"[AI] Answer cache: could not embed question: {e}")
+            return None
+        vectors = np.asarray([e["vector"] for e in entries], dtype="float32")
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = vectors @ query / np.where(norms == 0, 1.0, norms)
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity:
+            print(f"[AI] Answer cache: '{question}' matched '{entries[best]['question']}' ({scores[best]:.3f})")
+            return entries[best]["answer"], "semantic"
+        return None
+
+    def store(self, fingerprint, question, answer):
+        normalized = normalize_question(question)
+        self.exact.set(make_cache_key(fingerprint, normalized), {"question": question, "answer": answer})
+
+        if not self._semantic_enabled():
+            return
+        try:
+            vector = [float(x) for x in self.embed_query(normalized)]
+        except Exception as e:
+            print(f"[AI] Answer cache: could not embed question: {e}")
+            return
+        entries = [e for e in (self.semantic.get(fingerprint) or []) if e["question"] != normalized]
+        entries.append({"question": normalized, "vector": vector, "answer": answer})
+        self.semantic.set(fingerprint, entries[-self.max_semantic_entries:])
+
@@ -0,0 +1,111 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+# Words plus dotted references such as "12.3" or "s.4.1", so legal citations stay one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it of on or that the this to was what when where "
+    "which who why will with does do did can about under".split()
+)
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """In-memory inverted index over one document's chunks, scored with Okapi BM25.
+
+    Only postings and chunk lengths are kept. Hits are chunk numbers; the
+    chunk text lives once, in the vector store the chunks came from.
+    generation records which version of that store the index was built
+    from, so a stale index can be told apart from a current one.
+    """
+
+    FORMAT_VERSION = 2
+
+    def __init__(self, chunks=(), k1=1.5, b=0.75, postings=None, lengths=None, generation=None):
+        self.k1 = k1
+        self.b = b
+        self.generation = generation
+        if postings is None:
+            postings, lengths = {}, []
+            for i, chunk in enumerate(chunks):
+                counts = Counter(tokenize(chunk))
+                lengths.append(sum(counts.values()))
+                for term, tf in counts.items():
+                    postings.setdefault(term, []).append((i, tf))
+        self.postings = postings
+        self.lengths = lengths
+        self.avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def _idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.lengths) - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=5):
+        """Return up to k (chunk index, score) pairs, best first"""
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for i, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def nbytes(self):
+        """Rough in-memory size, for byte-budgeted caches"""
+        return len(self.lengths) * 8 + sum(len(p) for p in self.postings.values()) * 64
+
+    def dumps(self):
+        """Serialise to JSON, for a file or a database row"""
+        return json.dumps({
+            "version": self.FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "generation": self.generation,
+            "lengths": self.lengths,
+            "postings": self.postings,
+        })
+
+    @classmethod
+    def loads(cls, text):
+        """Inverse of dumps(); version 1 data (which also held chunk text) raises ValueError and is rebuilt"""
+        data = json.loads(text)
+        if data.get("version") != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index version {data.get('version')}")
+        return cls(
+            k1=data["k1"], b=data["b"],
+            postings={term: [tuple(p) for p in postings] for term, postings in data["postings"].items()},
+            lengths=data["lengths"],
+            generation=data.get("generation")
+        )
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per writer, so two workers saving the same index never share a temp file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.dumps())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.loads(f.read())
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several best-first lists of keys into one, scoring each key by sum(1 / (k + rank))"""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda key: -scores[key])
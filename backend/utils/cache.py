@@ -0,0 +1,281 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+
+# Mongo database used as the persistent cache tier (set by init_cache_store)
+_db = None
+
+# All tiered caches created in this process, by collection name
+_caches = {}
+
+def init_cache_store(db):
+    """Attach the Mongo database used as the persistent cache tier"""
+    global _db
+    _db = db
+
+def make_cache_key(*parts):
+    """Build a stable content hash from the given key parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def cache_stats():
+    """Return hit/miss counters for every tiered cache"""
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+class LRUCache:
+    """Thread-safe in-process LRU cache bounded by entry count and, optionally, bytes.
+
+    When max_bytes is set, sizeof(value) gives the approximate footprint of
+    each entry and least recently used entries are evicted to stay in budget.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, sizeof=None, name=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        if name:
+            _caches[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Larger than the whole budget - never cache it
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.current_bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self.current_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        if key in self._data:
+            del self._data[key]
+            self.current_bytes -= self._sizes.pop(key, 0)
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+class TieredCache:
+    """In-process LRU in front of a Mongo collection with optional TTL.
+
+    max_bytes and sizeof bound the in-process tier by size as well as by
+    entry count (see LRUCache); the Mongo tier is unaffected.
+    """
+
+    def __init__(self, collection_name, max_entries=1024, ttl_seconds=None, enabled=True, max_bytes=None, sizeof=None):
+        self.collection_name = collection_name
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.memory = LRUCache(max_entries, max_bytes=max_bytes, sizeof=sizeof)
+        self.hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self._indexed = False
+        self._lock = threading.Lock()
+        _caches[collection_name] = self
+
+    def _collection(self):
+        if _db is None:
+            return None
+        collection = _db[self.collection_name]
+        if not self._indexed:
+            try:
+                # Mongo removes documents once expires_at has passed
+                collection.create_index('expires_at', expireAfterSeconds=0)
+            except Exception as e:
+                print(f"[CACHE] Could not create TTL index on {self.collection_name}: {e}")
+            self._indexed = True
+        return collection
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        """Look up a key in memory, then in Mongo; returns None on a miss"""
+        if not self.enabled:
+            return None
+
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('hits')
+            return value
+
+        collection = self._collection()
+        if collection is not None:
+            try:
+                doc = collection.find_one({'_id': key})
+                if doc and (not doc.get('expires_at') or doc['expires_at'] > datetime.utcnow()):
+                    self.memory.set(key, doc['value'])
+                    self._count('mongo_hits')
+                    return doc['value']
+            except Exception as e:
+                print(f"[CACHE] {self.collection_name} lookup failed: {e}")
+
+        self._count('misses')
+        return None
+
+    def get_many(self, keys):
+        """Batch lookup; returns a dict of the keys that were found"""
+        if not self.enabled:
+            return {}
+
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.memory.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        with self._lock:
+            self.hits += len(found)
+
+        collection = self._collection()
+        if missing and collection is not None:
+            try:
+                now = datetime.utcnow()
+                for doc in collection.find({'_id': {'$in': missing}}):
+                    if doc.get('expires_at') and doc['expires_at'] <= now:
+                        continue
+                    found[doc['_id']] = doc['value']
+                    self.memory.set(doc['_id'], doc['value'])
+                    with self._lock:
+                        self.mongo_hits += 1
+            except Exception as e:
+                print(f"[CACHE] {self.collection_name} batch lookup failed: {e}")
+
+        with self._lock:
+            self.misses += len(set(keys) - set(found))
+        return found
+
+    def set_many(self, items):
+        """Store several (key, value) pairs in both tiers with one bulk write"""
+        if not self.enabled:
+            return
+
+        items = [(key, value) for key, value in items if value is not None]
+        for key, value in items:
+            self.memory.set(key, value)
+
+        collection = self._collection()
+        if not items or collection is None:
+            return
+
+        now = datetime.utcnow()
+        operations = []
+        for key, value in items:
+            entry = {'_id': key, 'value': value, 'created_at': now}
+            if self.ttl_seconds:
+                entry['expires_at'] = now + timedelta(seconds=self.ttl_seconds)
+            operations.append(ReplaceOne({'_id': key}, entry, upsert=True))
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"[CACHE] {self.collection_name} bulk store failed: {e}")
+
+    def set(self, key, value):
+        """Store a value in both tiers"""
+        if not self.enabled or value is None:
+            return
+
+        self.memory.set(key, value)
+
+        collection = self._collection()
+        if collection is None:
+            return
+
+        entry = {'_id': key, 'value': value, 'created_at': datetime.utcnow()}
+        if self.ttl_seconds:
+            entry['expires_at'] = entry['created_at'] + timedelta(seconds=self.ttl_seconds)
+        try:
+            collection.replace_one({'_id': key}, entry, upsert=True)
+        except Exception as e:
+            print(f"[CACHE] {self.collection_name} store failed: {e}")
+
+    def delete(self, key):
+        """Remove a key from both tiers"""
+        self.memory.delete(key)
+        collection = self._collection()
+        if collection is not None:
+            try:
+                collection.delete_one({'_id': key})
+            except Exception as e:
+                print(f"[CACHE] {self.collection_name} delete failed: {e}")
+
+    def get_or_compute(self, key, compute, bypass=False):
+        """Return the cached value for key, calling compute() on a miss.
+
+        With bypass=True the cache is not read, but the fresh value still
+        replaces the stored one so later calls see it.
+        """
+        if not bypass:
+            value = self.get(key)
+            if value is not None:
+                return value
+
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.mongo_hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries_in_memory': len(self.memory),
+            'hits': self.hits,
+            'mongo_hits': self.mongo_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.mongo_hits) / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,127 @@
+import zlib
+from collections import deque
+
+# Same hierarchy the LangChain recursive splitter used: paragraphs, lines, sentences, words, characters
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+def _pieces(text, start, end, separator):
+    """Spans of text[start:end] cut before each separator occurrence (the separator starts the next piece)"""
+    piece_start = start
+    position = text.find(separator, start + 1, end)
+    while position != -1:
+        yield piece_start, position
+        piece_start = position
+        position = text.find(separator, position + len(separator), end)
+    yield piece_start, end
+
+def _strip(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def _split(text, start, end, chunk_size, overlap, separators):
+    # The first separator that occurs in this region decides how it is cut
+    for i, separator in enumerate(separators):
+        if separator == "" or text.find(separator, start, end) != -1:
+            remaining = separators[i + 1:]
+            break
+    else:
+        separator, remaining = "", []
+
+    if separator == "":
+        # No separator left: fixed windows with the requested overlap
+        step = max(1, chunk_size - overlap)
+        for window_start in range(start, end, step):
+            yield window_start, min(window_start + chunk_size, end)
+            if window_start + chunk_size >= end:
+                break
+        return
+
+    window = deque()
+
+    def flush():
+        if window:
+            yield window[0][0], window[-1][1]
+
+    for piece_start, piece_end in _pieces(text, start, end, separator):
+        if piece_end - piece_start > chunk_size:
+            # Too big on its own: emit what we have and cut the piece with finer separators
+            yield from flush()
+            window.clear()
+            if remaining:
+                yield from _split(text, piece_start, piece_end, chunk_size, overlap, remaining)
+            else:
+                yield piece_start, piece_end
+            continue
+
+        if window and piece_end - window[0][0] > chunk_size:
+            yield from flush()
+            # Keep trailing pieces as overlap, as long as the next piece still fits after them
+            while window and (
+                window[-1][1] - window[0][0] > overlap
+                or piece_end - window[0][0] > chunk_size
+            ):
+                window.popleft()
+        window.append((piece_start, piece_end))
+
+    yield from flush()
+
+def iter_spans(text, chunk_size, overlap=0, separators=SEPARATORS):
+    """Lazily yield (start, end) offsets of chunks of at most chunk_size characters.
+
+    Text is cut on the coarsest separator that occurs, falling back to finer
+    ones for pieces that are still too long, and consecutive chunks share up
+    to overlap characters. Leading and trailing whitespace is trimmed from
+    each span, so text[start:end] is the chunk.
+    """
+    if overlap >= chunk_size:
+        raise ValueError(f"overlap ({overlap}) must be smaller than chunk_size ({chunk_size})")
+    for start, end in _split(text, 0, len(text), chunk_size, overlap, separators):
+        start, end = _strip(text, start, end)
+        if end > start:
+            yield start, end
+
+def iter_content_defined_spans(text, max_size, average_size):
+    """Lazily yield non-overlapping (start, end) chunk spans whose boundaries depend only on nearby content.
+
+    Chunks are built from whole paragraphs and closed after a paragraph
+    whose hash falls below a threshold proportional to its length, so
+    they average about average_size characters. An edit only moves the
+    boundaries around it: chunks elsewhere in the document come out
+    identical, which keeps per-chunk caches warm. Paragraphs longer than
+    max_size are cut with the finer separators.
+    """
+    min_size = average_size // 4
+    chunk_start = chunk_end = None
+
+    def flush():
+        if chunk_start is not None:
+            start, end = _strip(text, chunk_start, chunk_end)
+            if end > start:
+                yield start, end
+
+    for piece_start, piece_end in _pieces(text, 0, len(text), SEPARATORS[0]):
+        if piece_end - piece_start > max_size:
+            yield from flush()
+            chunk_start = chunk_end = None
+            for start, end in _split(text, piece_start, piece_end, max_size, 0, SEPARATORS[1:]):
+                start, end = _strip(text, start, end)
+                if end > start:
+                    yield start, end
+            continue
+
+        if chunk_start is not None and piece_end - chunk_start > max_size:
+            yield from flush()
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start = piece_start
+        chunk_end = piece_end
+
+        paragraph = text[piece_start:piece_end].strip()
+        if chunk_end - chunk_start >= min_size and zlib.crc32(paragraph.encode("utf-8")) % average_size < len(paragraph):
+            yield from flush()
+            chunk_start = None
+
+    yield from flush()
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utils.cache import make_cache_key
+from utils.llm_client import is_retryable_error
+from utils.providers import FAKE_EMBEDDING_DIM, WORD_PATTERN
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+EMBEDDING_BACKOFF_SECONDS = float(os.getenv("EMBEDDING_BACKOFF_SECONDS", "1"))
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that reuses vectors cached by content hash, model name and task type.
+
+    Uncached texts are embedded in batches of EMBEDDING_BATCH_SIZE with up
+    to EMBEDDING_CONCURRENCY requests in flight. Rate-limit and 5xx errors
+    are retried with exponential backoff. Every finished batch is written to
+    the cache straight away, so a run that fails part-way resumes where it
+    stopped. Vectors are cached as packed float32 bytes, a fraction of the
+    size of a list of Python floats.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, cache):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache = cache
+
+    def _key(self, text: str, task_type: str) -> str:
+        # Providers embed queries and documents differently, so the same text has two vectors
+        return make_cache_key(self.model_name, task_type, text)
+
+    @staticmethod
+    def _pack(vector):
+        return np.asarray(vector, dtype="float32").tobytes()
+
+    @staticmethod
+    def _unpack(value):
+        # Entries written before vectors were packed are plain lists
+        if isinstance(value, (bytes, bytearray)):
+            return np.frombuffer(value, dtype="float32").tolist()
+        return value
+
+    def _embed_batch(self, texts):
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                return self.underlying.embed_documents(texts)
+            except Exception as e:
+                if attempt == EMBEDDING_MAX_RETRIES or not is_retryable_error(e):
+                    raise
+                delay = EMBEDDING_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+                print(f"[AI] Embedding batch failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_documents(self, texts: List[str], progress=None) -> List[List[float]]:
+        keys = [self._key(text, "retrieval_document") for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Only embed texts we have never seen; duplicates are embedded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        missing_keys = list(missing.keys())
+        batches = [
+            missing_keys[i:i + EMBEDDING_BATCH_SIZE]
+            for i in range(0, len(missing_keys), EMBEDDING_BATCH_SIZE)
+        ]
+        done = [0]
+        lock = threading.Lock()
+
+        def run(batch_keys):
+            vectors = self._embed_batch([missing[key] for key in batch_keys])
+            items = [(key, self._pack(vector)) for key, vector in zip(batch_keys, vectors)]
+            self.cache.set_many(items)
+            with lock:
+                cached.update(items)
+                done[0] += 1
+                if progress:
+                    progress(done[0], len(batches))
+
+        if len(batches) == 1 or EMBEDDING_CONCURRENCY <= 1:
+            for batch_keys in batches:
+                run(batch_keys)
+        elif batches:
+            with ThreadPoolExecutor(max_workers=min(EMBEDDING_CONCURRENCY, len(batches))) as executor:
+                # list() re-raises the first batch failure after in-flight batches finish
+                list(executor.map(run, batches))
+
+        print(f"[AI] Embedded {len(missing)} new chunks in {len(batches)} batches, reused {len(texts) - len(missing)} cached")
+        return [self._unpack(cached[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text, "retrieval_query")
+        value = self.cache.get(key)
+        if value is None:
+            value = self._pack(self.underlying.embed_query(text))
+            self.cache.set(key, value)
+        return self._unpack(value)
+
+class FakeEmbeddings(Embeddings):
+    """Feature-hashed bag-of-words vectors: deterministic, and texts sharing words stay close"""
+
+    def __init__(self, provider, dim=FAKE_EMBEDDING_DIM):
+        self.provider = provider
+        self.dim = dim
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype="float32")
+        for word in WORD_PATTERN.findall(text.lower()):
+            bucket = zlib.crc32(word.encode("utf-8"))
+            vector[bucket % self.dim] += 1.0 if bucket & 0x80000000 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if not norm:
+            # No words at all: fall back to a vector seeded by the text hash
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype("float32")
+            norm = float(np.linalg.norm(vector))
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.provider._simulate()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.provider._simulate()
+        return self._vector(text)
@@ -0,0 +1,147 @@
+import re
+
+# Words that do not distinguish one entity from another
+CORPORATE_SUFFIXES = {"inc", "incorporated", "ltd", "limited", "llc", "llp", "plc", "corp", "corporation", "co", "company", "gmbh", "ag", "sa"}
+HONORIFICS = {"mr", "mrs", "ms", "dr", "prof", "sir"}
+TYPE_PREFIX = re.compile(r"^(person|project|company|organization|topic|technology|finding|concept|product|document)_")
+# Node types the model uses interchangeably for the same kind of entity
+TYPE_ALIASES = {"company": "organization"}
+
+def normalize_entity_key(label):
+    """Lookup key for an entity name: lowercase words without punctuation, honorifics or legal suffixes"""
+    words = re.sub(r"[^\w\s]", " ", (label or "").lower().replace("_", " ")).split()
+    if words and words[0] == "the":
+        words = words[1:]
+    while words and words[0] in HONORIFICS:
+        words = words[1:]
+    while len(words) > 1 and words[-1] in CORPORATE_SUFFIXES:
+        words = words[:-1]
+    return " ".join(words)
+
+def _entity_type(node):
+    node_type = str(node.get("type") or "").strip().lower()
+    return TYPE_ALIASES.get(node_type, node_type)
+
+def _acronym(key):
+    words = key.split()
+    return "".join(word[0] for word in words) if len(words) >= 2 else None
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression keeps later lookups near constant time
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+def resolve_entities(nodes, edges=()):
+    """Merge nodes that name the same entity and rewrite edges to the merged ids.
+
+    Nodes are merged when they share an id, or when they have the same
+    type and share a normalised label, a normalised id, an alias listed in
+    properties["aliases"], or one label is the acronym of the other ("IBM"
+    / "International Business Machines"). An acronym that could stand for
+    more than one full name of that type is left unmerged. Every merged group keeps its most frequently mentioned
+    node as the canonical one, with the other labels recorded under
+    "aliases". Edges are remapped to canonical ids; self-loops created by
+    merging, edges to unknown ids and duplicates are dropped. Runs in
+    time linear in the number of nodes and edges.
+
+    Returns (nodes, edges).
+    """
+    nodes = [node for node in nodes if isinstance(node, dict) and (node.get("id") or node.get("label"))]
+    if not nodes:
+        return [], []
+
+    uf = UnionFind(len(nodes))
+    # Alias table: every key a node is known by -> first node that claimed it
+    aliases = {}
+
+    def claim(key, i):
+        if not key[1]:
+            return
+        if key in aliases:
+            uf.union(aliases[key], i)
+        else:
+            aliases[key] = i
+
+    def claim_name(name, i):
+        # Scoped by type, so a finding called "Key" and a topic called "Key" stay apart
+        claim(("name", _entity_type(nodes[i]), normalize_entity_key(name)), i)
+
+    for i, node in enumerate(nodes):
+        claim(("id", node.get("id")), i)
+        claim_name(node.get("label"), i)
+        claim_name(TYPE_PREFIX.sub("", str(node.get("id") or "")), i)
+        listed = (node.get("properties") or {}).get("aliases")
+        for alias in listed if isinstance(listed, list) else []:
+            claim_name(alias, i)
+
+    # Full-name entities each acronym could stand for, by type
+    expansions = {}
+    for i, node in enumerate(nodes):
+        acronym = _acronym(normalize_entity_key(node.get("label")))
+        if acronym:
+            expansions.setdefault(("name", _entity_type(node), acronym), set()).add(uf.find(i))
+
+    # Acronyms only link to a full name, never to each other, and only when the full name is unambiguous
+    for key, full_names in expansions.items():
+        if len(full_names) == 1 and key in aliases:
+            uf.union(aliases[key], full_names.pop())
+
+    groups = {}
+    for i in range(len(nodes)):
+        groups.setdefault(uf.find(i), []).append(i)
+
+    canonical_id = {}
+    resolved = []
+    for members in groups.values():
+        # The label mentioned most often (then the longest) names the entity
+        counts = {}
+        for i in members:
+            counts[nodes[i].get("label", "")] = counts.get(nodes[i].get("label", ""), 0) + 1
+        best = max(members, key=lambda i: (counts[nodes[i].get("label", "")], len(nodes[i].get("label", "")), -i))
+
+        merged = dict(nodes[best])
+        merged.setdefault("id", normalize_entity_key(merged.get("label")).replace(" ", "_"))
+        properties = {}
+        for i in members:
+            for key, value in (nodes[i].get("properties") or {}).items():
+                properties.setdefault(key, value)
+        merged["properties"] = properties
+        labels = sorted({nodes[i].get("label") for i in members if nodes[i].get("label")} - {merged.get("label")})
+        if labels:
+            merged["aliases"] = labels
+        resolved.append(merged)
+
+        for i in members:
+            if nodes[i].get("id"):
+                canonical_id[nodes[i]["id"]] = merged["id"]
+
+    resolved_edges = {}
+    for edge in edges:
+        if not isinstance(edge, dict):
+            continue
+        source = canonical_id.get(edge.get("source"))
+        target = canonical_id.get(edge.get("target"))
+        if not source or not target or source == target:
+            continue
+        key = (source, target, edge.get("relationship"))
+        weight = edge.get("weight", 1.0)
+        existing = resolved_edges.get(key)
+        if existing is None:
+            resolved_edges[key] = {**edge, "source": source, "target": target}
+        elif isinstance(weight, (int, float)) and weight > existing.get("weight", 0):
+            existing["weight"] = weight
+
+    return resolved, list(resolved_edges.values())
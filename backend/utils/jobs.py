@@ -0,0 +1,270 @@
+import os
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Running jobs refresh heartbeat_at at least this often, whether or not they report progress
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+# Running jobs without a heartbeat for this long are assumed to belong to a dead worker
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "180"))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_handlers = {}
+_db = None
+
+def job_handler(kind):
+    """Register a function as the handler for a job kind"""
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+class Job:
+    """Handle passed to job handlers for database access and progress reporting"""
+
+    def __init__(self, db, job_id):
+        self.db = db
+        self.id = job_id
+
+    def report_progress(self, done, total, message=None):
+        update = {
+            'progress': round(done / total, 3) if total else 0.0,
+            'heartbeat_at': datetime.utcnow()
+        }
+        if message:
+            update['message'] = message
+        try:
+            self.db.jobs.update_one({'_id': self.id}, {'$set': update})
+        except Exception as e:
+            print(f"[JOBS] Could not record progress for job {self.id}: {e}")
+
+    def checkpoint(self):
+        """Checkpoint callables persisting intermediate state on the job document"""
+        def load():
+            job = self.db.jobs.find_one({'_id': self.id}, {'checkpoint': 1})
+            return job.get('checkpoint') if job else None
+
+        def save(state):
+            self.db.jobs.update_one(
+                {'_id': self.id},
+                {'$set': {'checkpoint': state, 'heartbeat_at': datetime.utcnow()}}
+            )
+
+        return {'load': load, 'save': save}
+
+def init_jobs(db):
+    """Attach the job store and resume jobs left over from a previous run"""
+    global _db
+    _db = db
+    if db is None:
+        return
+
+    try:
+        db.jobs.create_index([('kind', 1), ('document_id', 1), ('status', 1)])
+        stale_before = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+        db.jobs.update_many(
+            {'status': 'running', 'heartbeat_at': {'$lt': stale_before}},
+            {'$set': {'status': 'queued', 'message': 'Resumed after restart'}}
+        )
+        pending = list(db.jobs.find({'status': 'queued'}, {'_id': 1}))
+        for job in pending:
+            _executor.submit(_run_job, job['_id'])
+        if pending:
+            print(f"[JOBS] Resumed {len(pending)} pending jobs")
+    except Exception as e:
+        print(f"[JOBS] Could not resume pending jobs: {e}")
+
+def _revive_if_stale(job):
+    """Requeue a job whose worker died; returns the job as it now stands.
+
+    A running job whose heartbeat has stopped is put back in the queue,
+    and a queued job nobody has claimed for a while (the process that
+    queued it exited) is offered to this process's pool as well. Claiming
+    is atomic, so a job that is in fact alive is never run twice, and
+    revived_at is set by compare-and-set so repeated polls offer a job at
+    most once per staleness window.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=JOB_STALE_SECONDS)
+    if job['status'] == 'running' and (job.get('heartbeat_at') or job.get('started_at') or stale_before) <= stale_before:
+        requeued = _db.jobs.find_one_and_update(
+            {'_id': job['_id'], 'status': 'running', 'heartbeat_at': job.get('heartbeat_at')},
+            {'$set': {'status': 'queued', 'revived_at': now, 'message': 'Requeued after its worker stopped responding'}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not requeued:
+            return get_job(job['_id']) or job
+        print(f"[JOBS] Requeued stale {job['kind']} job {job['_id']}")
+        job = requeued
+    elif job['status'] != 'queued' or job['created_at'] > stale_before:
+        return job
+    else:
+        revived = _db.jobs.find_one_and_update(
+            {
+                '_id': job['_id'],
+                'status': 'queued',
+                '$or': [{'revived_at': {'$exists': False}}, {'revived_at': {'$lte': stale_before}}]
+            },
+            {'$set': {'revived_at': now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not revived:
+            # Already offered in this window, or claimed since it was read
+            return job
+        job = revived
+
+    _executor.submit(_run_job, job['_id'])
+    return job
+
+def submit_job(kind, params, user_id=None, document_id=None, dedupe=True, dedupe_key=None):
+    """Persist a job and queue it on the worker pool; returns the job document.
+
+    Jobs of one kind for one document are deduplicated; dedupe_key
+    distinguishes jobs that may run side by side for the same document
+    (e.g. translations into different languages). A job whose worker
+    died is requeued instead of being returned as if it were still
+    running. params['refresh'] upgrades a queued duplicate, and starts a
+    new job rather than reusing a running one that would not honour it.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if _db is None:
+        raise RuntimeError("Job store is not initialised")
+
+    if dedupe and document_id:
+        active = _db.jobs.find_one({
+            'kind': kind,
+            'document_id': document_id,
+            'dedupe_key': dedupe_key,
+            'status': {'$in': ['queued', 'running']}
+        }, sort=[('created_at', -1)])
+        if active:
+            active = _revive_if_stale(active)
+        if active and params.get('refresh') and not (active.get('params') or {}).get('refresh'):
+            # Not started yet, so it can still run with the new parameters
+            active = _db.jobs.find_one_and_update(
+                {'_id': active['_id'], 'status': 'queued'},
+                {'$set': {'params': params}},
+                return_document=ReturnDocument.AFTER
+            )
+        if active:
+            return active
+
+    job = {
+        '_id': str(uuid.uuid4()),
+        'kind': kind,
+        'status': 'queued',
+        'progress': 0.0,
+        'message': None,
+        'params': params,
+        'user_id': user_id,
+        'document_id': document_id,
+        'dedupe_key': dedupe_key,
+        'result': None,
+        'error': None,
+        'attempts': 0,
+        'created_at': datetime.utcnow()
+    }
+
+    # A retry after a failure picks up the intermediate state the failed run saved
+    if document_id:
+        failed = _db.jobs.find_one(
+            {'kind': kind, 'document_id': document_id, 'dedupe_key': dedupe_key, 'status': 'failed', 'checkpoint': {'$exists': True}},
+            sort=[('created_at', -1)]
+        )
+        if failed:
+            job['checkpoint'] = failed['checkpoint']
+
+    _db.jobs.insert_one(job)
+    _executor.submit(_run_job, job['_id'])
+    print(f"[JOBS] Queued {kind} job {job['_id']} for document {document_id}")
+    return job
+
+def get_job(job_id):
+    """Fetch a job document by id"""
+    if _db is None:
+        return None
+    return _db.jobs.find_one({'_id': job_id})
+
+def poll_job(job_id):
+    """Fetch a job for a client waiting on it, requeueing it if its worker died"""
+    job = get_job(job_id)
+    if job and job['status'] in ('queued', 'running'):
+        job = _revive_if_stale(job)
+    return job
+
+def serialize_job(job):
+    """JSON-friendly view of a job document"""
+    data = {
+        'job_id': job['_id'],
+        'kind': job.get('kind'),
+        'status': job.get('status'),
+        'progress': job.get('progress', 0.0),
+        'message': job.get('message'),
+        'document_id': job.get('document_id'),
+        'result': job.get('result'),
+        'error': job.get('error')
+    }
+    for field in ['created_at', 'started_at', 'finished_at']:
+        if job.get(field):
+            data[field] = job[field].isoformat() + 'Z'
+    return data
+
+def _run_job(job_id):
+    db = _db
+    now = datetime.utcnow()
+    # Claim the job atomically so a job is only ever run by one worker
+    job = db.jobs.find_one_and_update(
+        {'_id': job_id, 'status': 'queued'},
+        {
+            '$set': {
+                'status': 'running',
+                'started_at': now,
+                'heartbeat_at': now,
+                'worker': f"{socket.gethostname()}:{os.getpid()}"
+            },
+            '$inc': {'attempts': 1}
+        }
+    )
+    if not job:
+        return
+
+    # Keep the heartbeat fresh through long steps that report no progress
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                db.jobs.update_one({'_id': job_id, 'status': 'running'}, {'$set': {'heartbeat_at': datetime.utcnow()}})
+            except Exception as e:
+                print(f"[JOBS] Could not record heartbeat for job {job_id}: {e}")
+
+    threading.Thread(target=heartbeat, name=f"job-heartbeat-{job_id}", daemon=True).start()
+
+    handler = _handlers.get(job['kind'])
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind {job['kind']}")
+        result = handler(Job(db, job_id), **(job.get('params') or {}))
+        db.jobs.update_one({'_id': job_id}, {'$set': {
+            'status': 'completed',
+            'progress': 1.0,
+            'result': result,
+            'finished_at': datetime.utcnow()
+        }})
+        print(f"[JOBS] Completed {job['kind']} job {job_id}")
+    except Exception as e:
+        print(f"[JOBS] {job['kind']} job {job_id} failed: {e}")
+        traceback.print_exc()
+        db.jobs.update_one({'_id': job_id}, {'$set': {
+            'status': 'failed',
+            'error': str(e),
+            'finished_at': datetime.utcnow()
+        }})
+    finally:
+        stop_heartbeat.set()
@@ -0,0 +1,54 @@
+import re
+
+class KeywordMatcher:
+    """Finds any of a fixed set of keywords in one pass over the text.
+
+    The keywords are compiled into a single alternation (longest first, so
+    "action item" wins over "action"), and matching runs against the
+    lowered text, which is computed once per scan. Matches do not overlap:
+    a keyword that only occurs inside a longer keyword's match is not
+    reported by finditer().
+    """
+
+    def __init__(self, keywords, whole_words=False):
+        self.keywords = sorted({keyword.lower() for keyword in keywords if keyword}, key=lambda k: (-len(k), k))
+        alternation = "|".join(re.escape(keyword) for keyword in self.keywords)
+        if whole_words:
+            alternation = rf"\b(?:{alternation})\b"
+        self.pattern = re.compile(alternation) if self.keywords else None
+        self._ignorecase_pattern = re.compile(alternation, re.IGNORECASE) if self.keywords else None
+
+    def finditer(self, text):
+        """Yield (keyword, start, end) for every match, in text order"""
+        if self.pattern is None:
+            return
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            matches = self.pattern.finditer(lowered)
+        else:
+            # A few characters change length when lowered; match case-insensitively so offsets stay valid
+            matches = self._ignorecase_pattern.finditer(text)
+        for match in matches:
+            yield match.group(0).lower(), match.start(), match.end()
+
+    def find_all(self, text):
+        return list(self.finditer(text))
+
+    def matched(self, text):
+        """The set of keywords that occur anywhere in text, from a single finditer() scan"""
+        return {keyword for keyword, _, _ in self.finditer(text)}
+
+    def matching_lines(self, text, limit=None):
+        """(start, end) spans of lines containing a keyword, in order, each line once"""
+        lines = []
+        last_line_start = -1
+        for _, start, _ in self.finditer(text):
+            line_start = text.rfind("\n", 0, start) + 1
+            if line_start == last_line_start:
+                continue
+            line_end = text.find("\n", start)
+            lines.append((line_start, len(text) if line_end == -1 else line_end))
+            last_line_start = line_start
+            if limit and len(lines) == limit:
+                break
+        return lines
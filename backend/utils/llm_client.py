@@ -0,0 +1,204 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from dotenv import load_dotenv
+from utils.providers import get_provider, LLM_PROVIDER
+
+load_dotenv()
+
+# Configuration surface - every generator in utils/ai.py goes through this client
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash")
+LLM_GENERATION_CONFIG = {
+    key: value for key, value in {
+        "temperature": float(os.getenv("LLM_TEMPERATURE")) if os.getenv("LLM_TEMPERATURE") else None,
+        "max_output_tokens": int(os.getenv("LLM_MAX_OUTPUT_TOKENS")) if os.getenv("LLM_MAX_OUTPUT_TOKENS") else None,
+    }.items() if value is not None
+}
+# Send response schemas to the model's JSON mode; turn off for models that do not support it
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1").lower() not in ("0", "false", "no")
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1"))
+# Consecutive upstream failures before the breaker opens, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Overall deadline in seconds per operation, shared by all retries of one call
+OPERATION_DEADLINES = {
+    "chat": 60,
+    "summary_chunk": 120,
+    "summary_reduce": 180,
+    "graph": 120,
+    "translate": 120,
+    "insights": 180,
+    "suggestions": 180,
+    "count_tokens": 20,
+    "default": 120,
+}
+
+RETRYABLE_STATUS = re.compile(r"\b(429|500|502|503|504)\b|resource.{0,20}exhausted|rate limit|unavailable|deadline|timed? ?out", re.IGNORECASE)
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+def is_retryable_error(error):
+    """Rate limits, timeouts and upstream 5xx errors are worth retrying; bad requests are not"""
+    if isinstance(error, TimeoutError):
+        return True
+    code = getattr(error, 'code', None)
+    if callable(code):
+        code = code()
+    if isinstance(code, int) and (code == 429 or code >= 500):
+        return True
+    return bool(RETRYABLE_STATUS.search(str(error)))
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures, then let one trial call through"""
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            # Half-open lets exactly one trial call through; everyone else keeps failing fast until it finishes
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_in_flight:
+                raise CircuitOpenError("LLM service is unavailable, try again shortly")
+            self.trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight:
+                # The trial call failed: stay open for another cooldown
+                self.trial_in_flight = False
+                self.opened_at = time.monotonic()
+                print("[LLM] Circuit breaker trial call failed, reopening")
+            elif self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                print(f"[LLM] Circuit breaker opened after {self.failures} failures")
+
+    def release(self):
+        """End a call that says nothing about upstream health; a pending trial goes to the next caller"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self.opened_at < self.cooldown else "half_open"
+
+class LLMClient:
+    """Shared model client: deadlines, retries and a circuit breaker around a provider"""
+
+    def __init__(self, model_name=LLM_MODEL, generation_config=None, max_retries=LLM_MAX_RETRIES, breaker=None, provider=None):
+        self.model_name = model_name
+        self.generation_config = dict(generation_config if generation_config is not None else LLM_GENERATION_CONFIG)
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.provider = provider or get_provider()
+
+    def _config(self, response_schema=None):
+        if response_schema is None or not LLM_STRUCTURED_OUTPUT:
+            return self.generation_config
+        return {**self.generation_config, "response_mime_type": "application/json", "response_schema": response_schema}
+
+    def config_key(self, response_schema=None):
+        """Identifies everything that changes the output for a given prompt"""
+        return json.dumps({
+            "provider": self.provider.name,
+            "model": self.model_name,
+            "config": self._config(response_schema)
+        }, sort_keys=True)
+
+    def _call(self, fn, operation):
+        """Run fn(timeout) under the operation deadline with jittered retries"""
+        deadline = time.monotonic() + OPERATION_DEADLINES.get(operation, OPERATION_DEADLINES["default"])
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"LLM {operation} call exceeded its deadline")
+            self.breaker.before_call()
+            try:
+                result = fn(remaining)
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                if not is_retryable_error(e):
+                    # A rejected request is not an upstream outage
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                delay = LLM_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    raise
+                print(f"[LLM] {operation} failed (attempt {attempt + 1}/{self.max_retries + 1}): {e}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def generate(self, prompt, operation="default", response_schema=None):
+        """Generate the full response text for a prompt, as JSON matching response_schema if given"""
+        config = self._config(response_schema)
+        return self._call(
+            lambda timeout: self.provider.generate(prompt, self.model_name, config, timeout),
+            operation
+        )
+
+    def stream(self, prompt, operation="chat"):
+        """Yield response text as it streams; retries only happen before the first chunk"""
+        chunks = self._call(
+            lambda timeout: self.provider.stream(prompt, self.model_name, self.generation_config, timeout),
+            operation
+        )
+        try:
+            yield from chunks
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+    def count_tokens(self, text, model_name=None):
+        return self._call(
+            lambda timeout: self.provider.count_tokens(text, model_name or self.model_name, timeout),
+            "count_tokens"
+        )
+
+    def stats(self):
+        return {
+            "provider": self.provider.name,
+            "model": self.model_name,
+            "generation_config": self.generation_config,
+            "structured_output": LLM_STRUCTURED_OUTPUT,
+            "circuit_breaker": self.breaker.state(),
+            "consecutive_failures": self.breaker.failures
+        }
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_llm_client():
+    """Process-wide LLM client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
+
+def llm_client_stats():
+    """Stats of the shared client, without constructing it (and loading the provider SDK) just to report them"""
+    client = _client
+    return client.stats() if client is not None else {"initialized": False, "provider": LLM_PROVIDER, "model": LLM_MODEL}
@@ -0,0 +1,80 @@
+import re
+import numpy as np
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*|\d+(?:[.,]\d+)*")
+VOWEL_GROUP = re.compile(r"[aeiouyàáâäèéêëìíîïòóôöùúûü]+")
+SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Markdown headings, numbered clauses ("1.", "2.3") and short all-caps lines
+SECTION_HEADING = re.compile(r"^(?:#{1,6}\s+\S.*|\d+(?:\.\d+)*\.?\s+[A-Z].{0,80}|[A-Z][A-Z0-9 ,&/-]{2,60})$", re.MULTILINE)
+WORDS_PER_MINUTE = 238
+
+def _syllable_counts(lowered, starts, ends):
+    """Per-word syllable estimate: vowel groups, minus a silent final e, at least one"""
+    group_starts = np.fromiter((m.start() for m in VOWEL_GROUP.finditer(lowered)), dtype=np.int64)
+    # Each vowel group belongs to the word whose span contains it; groups between words fall out
+    owner = np.searchsorted(starts, group_starts, side="right") - 1
+    inside = (owner >= 0) & (group_starts < ends[np.clip(owner, 0, None)])
+    counts = np.bincount(owner[inside], minlength=len(starts))
+
+    codepoints = np.frombuffer(lowered.encode("utf-32-le"), dtype=np.uint32)
+    end_chars = codepoints[ends - 1]
+    before_end = codepoints[np.maximum(ends - 2, starts)]
+    lengths = ends - starts
+    silent_e = (end_chars == ord("e")) & (before_end != ord("l")) & (lengths > 2) & (counts > 1)
+    return np.maximum(counts - silent_e, 1)
+
+def compute_document_metrics(text):
+    """Length, structure and readability metrics for a document, computed without the LLM.
+
+    Word and syllable statistics are gathered once into arrays so the
+    readability formulas (Flesch, Flesch-Kincaid, Gunning Fog, SMOG,
+    Coleman-Liau, ARI) are a few vector operations however long the
+    document is.
+    """
+    spans = np.array([m.span() for m in WORD_PATTERN.finditer(text)], dtype=np.int64).reshape(-1, 2)
+    words = len(spans)
+    sentences = max(len(SENTENCE_END.findall(text)), 1 if words else 0)
+    paragraphs = sum(1 for p in PARAGRAPH_BREAK.split(text) if p.strip())
+    sections = len(SECTION_HEADING.findall(text))
+    metrics = {
+        "characters": len(text),
+        "words": words,
+        "sentences": sentences,
+        "paragraphs": paragraphs,
+        "sections": sections,
+    }
+    if not words:
+        return metrics
+
+    starts, ends = spans[:, 0], spans[:, 1]
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters change length when lowered; keep offsets valid at the cost of exact casing
+        lowered = "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+    syllables = _syllable_counts(lowered, starts, ends)
+    letters = int((ends - starts).sum())
+    polysyllables = int((syllables >= 3).sum())
+    unique_words = len({lowered[s:e] for s, e in spans.tolist()})
+
+    words_per_sentence = words / sentences
+    syllables_per_word = float(syllables.sum()) / words
+    letters_per_100 = letters / words * 100
+    sentences_per_100 = sentences / words * 100
+
+    metrics.update({
+        "unique_words": unique_words,
+        "lexical_diversity": round(unique_words / words, 3),
+        "avg_words_per_sentence": round(words_per_sentence, 1),
+        "avg_sentences_per_paragraph": round(sentences / max(paragraphs, 1), 1),
+        "avg_syllables_per_word": round(syllables_per_word, 2),
+        "complex_word_ratio": round(polysyllables / words, 3),
+        "flesch_reading_ease": round(206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word, 1),
+        "flesch_kincaid_grade": round(0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59, 1),
+        "gunning_fog": round(0.4 * (words_per_sentence + 100 * polysyllables / words), 1),
+        "smog_index": round(1.043 * (polysyllables * 30 / sentences) ** 0.5 + 3.1291, 1),
+        "coleman_liau_index": round(0.0588 * letters_per_100 - 0.296 * sentences_per_100 - 15.8, 1),
+        "automated_readability_index": round(4.71 * letters / words + 0.5 * words_per_sentence - 21.43, 1),
+        "reading_time_minutes": round(words / WORDS_PER_MINUTE, 1),
+    })
+    return metrics
@@ -0,0 +1,62 @@
+"""Convert LangChain FAISS vector stores to the pickle-free store format.
+
+Every vector_stores/<document_id>/ directory that still holds an
+index.pkl is rewritten in place (see utils/vector_store.py); stores that
+are already converted are skipped. Vectors are copied, not re-embedded,
+so no model calls are made. Run from backend/:
+
+    python -m utils.migrate_vector_stores
+    python -m utils.migrate_vector_stores --root /data/vector_stores --dry-run
+"""
+import argparse
+import os
+import sys
+from utils.vector_store import DocumentVectorStore, migrate_legacy_store
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path)
+        if os.path.isfile(os.path.join(path, name))
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default="vector_stores", help="directory holding one store per document")
+    parser.add_argument("--dry-run", action="store_true", help="list stores that would be converted")
+    parser.add_argument("--keep-legacy", action="store_true", help="leave index.pkl in place after converting")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"No vector store directory at {args.root}")
+        return
+
+    converted = failed = 0
+    before_total = after_total = 0
+    for name in sorted(os.listdir(args.root)):
+        path = os.path.join(args.root, name)
+        if not os.path.isdir(path) or not DocumentVectorStore.is_legacy(path):
+            continue
+        if args.dry_run:
+            print(f"would convert {path}")
+            continue
+        before = directory_size(path)
+        try:
+            store = migrate_legacy_store(path, document_id=name, remove_legacy=not args.keep_legacy)
+        except Exception as e:
+            failed += 1
+            print(f"FAILED {path}: {e}")
+            continue
+        after = directory_size(path)
+        converted += 1
+        before_total += before
+        after_total += after
+        print(f"converted {path}: {store.manifest['count']} chunks, {before / 1024:.0f} KB -> {after / 1024:.0f} KB")
+
+    if not args.dry_run:
+        print(f"{converted} converted, {failed} failed, {before_total / 1024:.0f} KB -> {after_total / 1024:.0f} KB")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import hashlib
+import math
+import os
+from collections import namedtuple
+from utils.cache import TieredCache, make_cache_key
+from utils.llm_client import get_llm_client
+
+# Input token limits of the models we use
+MODEL_CONTEXT_TOKENS = {
+    "gemini-1.5-flash": 1048576,
+    "gemini-1.5-pro": 2097152,
+}
+MODEL_OUTPUT_TOKENS = {
+    "gemini-1.5-flash": 8192,
+    "gemini-1.5-pro": 8192,
+}
+DEFAULT_CONTEXT_TOKENS = 32768
+DEFAULT_OUTPUT_TOKENS = 8192
+
+# Rough average for English prose; only used to skip exact counts that cannot change the plan
+CHARS_PER_TOKEN = 4
+# Room left for prompt instructions around the document text
+PROMPT_OVERHEAD_TOKENS = 1024
+# Expected size of one partial summary fed into a reduce step
+PARTIAL_SUMMARY_TOKENS = 1024
+
+# Optional hard cap on prompt size, e.g. to bound latency and cost per call
+MAX_PROMPT_TOKENS = int(os.getenv("AI_MAX_PROMPT_TOKENS", "0")) or None
+
+token_count_cache = TieredCache("token_counts", max_entries=4096)
+
+DocumentPlan = namedtuple("DocumentPlan", ["mode", "tokens", "budget", "chunk_size", "chunk_count"])
+
+def context_budget(model_name):
+    """Tokens available for document text in a single prompt to model_name"""
+    limit = MODEL_CONTEXT_TOKENS.get(model_name, DEFAULT_CONTEXT_TOKENS)
+    budget = limit - MODEL_OUTPUT_TOKENS.get(model_name, DEFAULT_OUTPUT_TOKENS) - PROMPT_OVERHEAD_TOKENS
+    if MAX_PROMPT_TOKENS:
+        budget = min(budget, MAX_PROMPT_TOKENS)
+    return budget
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def count_tokens(text, model_name):
+    """Exact token count from the model API, cached per content hash.
+
+    If the API call fails the character estimate is returned, but not
+    cached, so a later call asks the API again.
+    """
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    client = get_llm_client()
+    key = make_cache_key(client.provider.name, model_name, text_hash)
+
+    try:
+        return token_count_cache.get_or_compute(key, lambda: client.count_tokens(text, model_name))
+    except Exception as e:
+        print(f"[AI] Token count failed, using estimate: {e}")
+        return estimate_tokens(text)
+
+def fits_in_context(text, max_tokens, model_name):
+    """Whether text fits in max_tokens, counting exactly only when the estimate is close"""
+    estimate = estimate_tokens(text)
+    if estimate <= max_tokens // 2:
+        return True
+    if estimate >= max_tokens * 2:
+        return False
+    return count_tokens(text, model_name) <= max_tokens
+
+def plan_document(text, model_name, max_chunk_tokens=None):
+    """Choose how to process text for one generation task.
+
+    Returns a DocumentPlan whose mode is "single" when the text fits in one
+    call, "map_reduce" when it must be split but all partial results fit in
+    one reduce prompt, and "hierarchical" when the partial results
+    themselves need to be reduced in several levels. max_chunk_tokens caps
+    chunk size for tasks whose output grows with the input (translation,
+    entity extraction).
+    """
+    budget = context_budget(model_name)
+    chunk_tokens = min(budget, max_chunk_tokens) if max_chunk_tokens else budget
+
+    if fits_in_context(text, chunk_tokens, model_name):
+        return DocumentPlan("single", estimate_tokens(text), budget, len(text), 1)
+
+    # Leave headroom for text that tokenizes denser than the average
+    chunk_size = int(chunk_tokens * CHARS_PER_TOKEN * 0.9)
+    chunk_count = math.ceil(len(text) / chunk_size)
+    mode = "hierarchical" if chunk_count * PARTIAL_SUMMARY_TOKENS > budget else "map_reduce"
+    return DocumentPlan(mode, estimate_tokens(text), budget, chunk_size, chunk_count)
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "gemini" talks to the real API; "fake" is a deterministic offline backend for benchmarks and load tests
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+
+# Fake provider knobs
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+FAKE_LLM_OUTPUT_WORDS = int(os.getenv("FAKE_LLM_OUTPUT_WORDS", "200"))
+FAKE_EMBEDDING_DIM = int(os.getenv("FAKE_EMBEDDING_DIM", "768"))
+
+class GeminiProvider:
+    """Google Gemini models and embeddings"""
+
+    name = "gemini"
+
+    def __init__(self):
+        # The SDK takes most of a second to import, so it is loaded with the first provider rather than the module
+        import google.generativeai as genai
+        self._genai = genai
+        self._api_key = os.getenv("GEMINI_API_KEY")
+        self._models = {}
+        self._lock = threading.Lock()
+        genai.configure(api_key=self._api_key)
+
+    def _model(self, model_name, generation_config):
+        key = json.dumps([model_name, generation_config], sort_keys=True)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self._genai.GenerativeModel(model_name, generation_config=generation_config or None)
+            return self._models[key]
+
+    def generate(self, prompt, model_name, generation_config, timeout):
+        model = self._model(model_name, generation_config)
+        return model.generate_content(prompt, request_options={"timeout": timeout}).text
+
+    def stream(self, prompt, model_name, generation_config, timeout):
+        model = self._model(model_name, generation_config)
+        response = model.generate_content(prompt, stream=True, request_options={"timeout": timeout})
+
+        def chunks():
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata only)
+                    continue
+                if text:
+                    yield text
+
+        return chunks()
+
+    def count_tokens(self, text, model_name, timeout):
+        model = self._model(model_name, None)
+        return model.count_tokens(text, request_options={"timeout": timeout}).total_tokens
+
+    def embeddings(self, model_name):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=model_name, google_api_key=self._api_key)
+
+class FakeProviderError(Exception):
+    """Injected failure; worded like an upstream 503 so callers retry it"""
+
+WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'-]+")
+NAME_PATTERN = re.compile(r"\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?\b")
+NODE_TYPES = ["person", "company", "project", "topic", "technology", "finding"]
+
+class FakeProvider:
+    """Offline stand-in for Gemini with deterministic output.
+
+    Responses depend only on the prompt: knowledge-graph prompts get a
+    valid graph JSON built from capitalised names in the text, and every
+    other prompt gets text assembled from its own words. Latency and error
+    rate are injected per call from FAKE_LLM_LATENCY_MS and
+    FAKE_LLM_ERROR_RATE, with failures drawn from a FAKE_LLM_SEED seeded
+    generator.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms=FAKE_LLM_LATENCY_MS, error_rate=FAKE_LLM_ERROR_RATE, seed=FAKE_LLM_SEED):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if self.error_rate:
+            with self._lock:
+                failed = self._random.random() < self.error_rate
+            if failed:
+                raise FakeProviderError("503 Service unavailable (injected by fake provider)")
+
+    def _respond(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        if '"nodes"' in prompt and "JSON" in prompt:
+            return json.dumps(self._graph(prompt))
+        if '"answers"' in prompt and "JSON" in prompt:
+            listed = prompt.split("questions about the document:", 1)[-1].split("Instructions:", 1)[0]
+            questions = re.findall(r"^\d+\. (.+)$", listed, re.MULTILINE)
+            return json.dumps({"answers": [
+                {"question": question, "answer": f"Answer {digest.hex()[:8]}-{i}: {question}"}
+                for i, question in enumerate(questions)
+            ]})
+
+        words = WORD_PATTERN.findall(prompt[-20000:]) or ["empty"]
+        rng = random.Random(digest)
+        lines = [f"Response {digest.hex()[:8]}:"]
+        for start in range(0, FAKE_LLM_OUTPUT_WORDS, 20):
+            count = min(20, FAKE_LLM_OUTPUT_WORDS - start)
+            lines.append("- " + " ".join(rng.choice(words) for _ in range(count)))
+        return "\n".join(lines)
+
+    def _graph(self, prompt):
+        text = prompt.split("Text:", 1)[-1].split("Extract entities", 1)[0]
+        names = []
+        for match in NAME_PATTERN.findall(text):
+            if match not in names:
+                names.append(match)
+            if len(names) == 8:
+                break
+
+        nodes = [
+            {
+                "id": f"{NODE_TYPES[i % len(NODE_TYPES)]}_{name.lower().replace(' ', '_')}",
+                "label": name,
+                "type": NODE_TYPES[i % len(NODE_TYPES)],
+                "properties": {}
+            }
+            for i, name in enumerate(names)
+        ]
+        edges = [
+            {"source": a["id"], "target": b["id"], "relationship": "related_to", "weight": 1.0}
+            for a, b in zip(nodes, nodes[1:])
+        ]
+        return {
+            "nodes": nodes,
+            "edges": edges,
+            "topics": [node["label"] for node in nodes if node["type"] == "topic"],
+            "action_items": [
+                {"task": f"Review {node['label']}", "assignee": "Unassigned", "due_date": "TBD", "priority": "medium"}
+                for node in nodes[:1]
+            ]
+        }
+
+    def generate(self, prompt, model_name, generation_config, timeout):
+        self._simulate()
+        return self._respond(prompt)
+
+    def stream(self, prompt, model_name, generation_config, timeout):
+        self._simulate()
+        text = self._respond(prompt)
+        return iter(re.findall(r"\S+\s*", text))
+
+    def count_tokens(self, text, model_name, timeout):
+        self._simulate()
+        return len(text) // 4 + 1
+
+    def embeddings(self, model_name):
+        from utils.embeddings import FakeEmbeddings
+        return FakeEmbeddings(self)
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "fake": FakeProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_provider():
+    """Process-wide model provider selected by LLM_PROVIDER"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if LLM_PROVIDER not in PROVIDERS:
+                raise ValueError(f"Unknown LLM_PROVIDER {LLM_PROVIDER!r}, expected one of {sorted(PROVIDERS)}")
+            _provider = PROVIDERS[LLM_PROVIDER]()
+        return _provider
@@ -0,0 +1,360 @@
+import fcntl
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+
+# Documents with at most this many live chunks are searched exactly instead of via HNSW
+BRUTE_FORCE_LIMIT = 4096
+# Rebuild a shard once this fraction of its vectors belongs to deleted documents
+COMPACTION_THRESHOLD = 0.2
+
+class SharedVectorIndex:
+    """A few FAISS HNSW shards holding chunks from every document.
+
+    Vectors live in shard indexes keyed by an integer chunk id; a single
+    SQLite table maps each id to its document, user and text, and another
+    holds each document's keyword postings. Queries are
+    restricted to one document (or user) with an id selector, and deleted
+    documents are tombstoned and physically removed by compact().
+
+    Several worker processes may open the same index. Chunk ids are
+    allocated inside a SQLite write transaction, and every shard write
+    (reload, add, save) holds an exclusive lock file for that shard, so
+    one process never overwrites vectors another has just added.
+    """
+
+    def __init__(self, root, num_shards=4, hnsw_m=32, ef_search=64):
+        self.root = root
+        self.num_shards = num_shards
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self._shards = {}
+        self._shard_versions = {}
+        self._locks = [threading.RLock() for _ in range(num_shards)]
+        # Open lock file per shard while this process holds it, so nested writes do not relock
+        self._lock_files = [None] * num_shards
+        self._db_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        # Other processes may hold the write lock briefly while allocating ids
+        self._db = sqlite3.connect(os.path.join(root, "chunks.sqlite3"), check_same_thread=False, timeout=30)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                shard INTEGER NOT NULL,
+                document_id TEXT NOT NULL,
+                user_id TEXT,
+                chunk_id INTEGER,
+                chunk_hash TEXT,
+                start_offset INTEGER,
+                end_offset INTEGER,
+                text TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks (document_id, deleted);
+            CREATE INDEX IF NOT EXISTS idx_chunks_user ON chunks (user_id, deleted);
+            CREATE INDEX IF NOT EXISTS idx_chunks_shard ON chunks (shard, deleted);
+            CREATE TABLE IF NOT EXISTS keyword_indexes (
+                document_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+        """)
+        # Databases created before chunk offsets were recorded
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(chunks)")}
+        for column in ["start_offset", "end_offset"]:
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE chunks ADD COLUMN {column} INTEGER")
+        self._db.commit()
+
+    def _insert_pending(self, rows):
+        """Insert chunk rows as tombstones and return their ids.
+
+        Ids are read and claimed in one IMMEDIATE transaction, which holds
+        SQLite's write lock, so concurrent processes never get the same ids.
+        The rows stay deleted until their vectors are saved; if this
+        process dies first, compaction removes them.
+        """
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                start = self._db.execute("SELECT COALESCE(MAX(id), -1) + 1 FROM chunks").fetchone()[0]
+                self._db.executemany(
+                    "INSERT INTO chunks (id, shard, document_id, user_id, chunk_id, chunk_hash, start_offset, end_offset, text, deleted) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)",
+                    [(start + i, *row) for i, row in enumerate(rows)]
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        return np.arange(start, start + len(rows), dtype="int64")
+
+    def _query(self, sql, params=()):
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _shard_for(self, user_id):
+        return zlib.crc32((user_id or "").encode("utf-8")) % self.num_shards
+
+    def _shard_path(self, shard):
+        return os.path.join(self.root, f"shard_{shard:02d}.faiss")
+
+    def _new_shard(self, dim):
+        hnsw = faiss.IndexHNSWFlat(dim, self.hnsw_m)
+        hnsw.hnsw.efSearch = self.ef_search
+        return faiss.IndexIDMap2(hnsw)
+
+    @staticmethod
+    def _file_version(path):
+        # Every save renames a new file into place, so the inode changes even within one mtime tick
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    @contextmanager
+    def _writing(self, shard):
+        """Hold a shard exclusively, against other threads and other processes"""
+        with self._locks[shard]:
+            if self._lock_files[shard] is not None:
+                # Already held further up this thread's stack
+                yield
+                return
+            with open(self._shard_path(shard) + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_files[shard] = lock_file
+                try:
+                    yield
+                finally:
+                    self._lock_files[shard] = None
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _get_shard(self, shard, dim=None):
+        """Return the loaded shard index, re-reading it when another process rewrote it"""
+        path = self._shard_path(shard)
+        version = self._file_version(path)
+        if shard not in self._shards or (version is not None and version != self._shard_versions.get(shard)):
+            if version is not None:
+                self._shards[shard] = faiss.read_index(path)
+                self._shard_versions[shard] = version
+            elif dim is not None:
+                self._shards[shard] = self._new_shard(dim)
+            else:
+                return None
+        return self._shards[shard]
+
+    def _save_shard(self, shard):
+        path = self._shard_path(shard)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        faiss.write_index(self._shards[shard], tmp_path)
+        os.replace(tmp_path, path)
+        self._shard_versions[shard] = self._file_version(path)
+
+    def _live_shards(self, document_id):
+        return {row[0] for row in self._query(
+            "SELECT DISTINCT shard FROM chunks WHERE document_id = ? AND deleted = 0", (document_id,)
+        )}
+
+    def _compact_if_needed(self, shards):
+        for shard in shards:
+            total, dead = self._query(
+                "SELECT COUNT(*), COALESCE(SUM(deleted), 0) FROM chunks WHERE shard = ?", (shard,)
+            )[0]
+            if total and dead / total >= COMPACTION_THRESHOLD:
+                self.compact(shard)
+
+    def document_generation(self, document_id):
+        """Identifies the current version of a document's chunks; every replace assigns new row ids"""
+        return self._query("SELECT MIN(id) FROM chunks WHERE document_id = ? AND deleted = 0", (document_id,))[0][0]
+
+    def chunk_texts(self, document_id, chunk_ids=None):
+        """Map chunk id to text for a document's live chunks, for the given ids or all of them"""
+        sql = "SELECT chunk_id, text FROM chunks WHERE document_id = ? AND deleted = 0"
+        params = [document_id]
+        if chunk_ids is not None:
+            chunk_ids = [int(chunk_id) for chunk_id in chunk_ids]
+            if not chunk_ids:
+                return {}
+            sql += f" AND chunk_id IN ({','.join('?' * len(chunk_ids))})"
+            params += chunk_ids
+        return dict(self._query(sql, params))
+
+    def save_keyword_index(self, document_id, data):
+        """Store a document's serialised keyword postings next to its chunk rows"""
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO keyword_indexes (document_id, data) VALUES (?, ?)", (document_id, data))
+            self._db.commit()
+
+    def load_keyword_index(self, document_id):
+        rows = self._query("SELECT data FROM keyword_indexes WHERE document_id = ?", (document_id,))
+        return rows[0][0] if rows else None
+
+    def has_document(self, document_id):
+        rows = self._query("SELECT 1 FROM chunks WHERE document_id = ? AND deleted = 0 LIMIT 1", (document_id,))
+        return bool(rows)
+
+    def replace_document(self, document_id, user_id, chunks, metadatas, vectors):
+        """Store a document's chunks, tombstoning whatever it held before.
+
+        The new chunks become visible, and the old ones disappear, in one
+        transaction after the shard holding their vectors has been saved.
+        """
+        shard = self._shard_for(user_id)
+        vectors = np.asarray(vectors, dtype="float32")
+        previous_shards = self._live_shards(document_id)
+        if not len(chunks):
+            # Blank content has no vectors, and no dimension to open a shard with; just retire the old chunks
+            with self._db_lock:
+                self._db.execute("UPDATE chunks SET deleted = 1 WHERE document_id = ?", (document_id,))
+                self._db.commit()
+            print(f"[AI] Shared index: document {document_id} is now empty")
+            self._compact_if_needed(previous_shards)
+            return
+        rows = [
+            (
+                shard, document_id, user_id, metadata.get("chunk_id"), metadata.get("chunk_hash"),
+                metadata.get("start"), metadata.get("end"), text
+            )
+            for text, metadata in zip(chunks, metadatas)
+        ]
+
+        with self._writing(shard):
+            # Reloads the shard if another process saved it since we last read it
+            index = self._get_shard(shard, dim=vectors.shape[1])
+            ids = self._insert_pending(rows) if rows else np.zeros(0, dtype="int64")
+            try:
+                if len(ids):
+                    index.add_with_ids(vectors, ids)
+                self._save_shard(shard)
+            except Exception:
+                # The in-memory copy no longer matches the file
+                self._shards.pop(shard, None)
+                raise
+            first, last = (int(ids[0]), int(ids[-1])) if len(ids) else (0, -1)
+            with self._db_lock:
+                self._db.execute(
+                    "UPDATE chunks SET deleted = 1 WHERE document_id = ? AND id NOT BETWEEN ? AND ?",
+                    (document_id, first, last)
+                )
+                self._db.execute("UPDATE chunks SET deleted = 0 WHERE id BETWEEN ? AND ?", (first, last))
+                self._db.commit()
+
+        print(f"[AI] Shared index: stored {len(chunks)} chunks for document {document_id} in shard {shard}")
+        # Documents that keep being edited leave tombstones behind just like deleted ones
+        self._compact_if_needed(previous_shards | {shard})
+
+    def delete_document(self, document_id, compact=True):
+        """Tombstone a document's chunks; compacts affected shards past the threshold"""
+        shards = self._live_shards(document_id)
+        with self._db_lock:
+            self._db.execute("UPDATE chunks SET deleted = 1 WHERE document_id = ?", (document_id,))
+            self._db.execute("DELETE FROM keyword_indexes WHERE document_id = ?", (document_id,))
+            self._db.commit()
+
+        if compact:
+            self._compact_if_needed(shards)
+
+    def compact(self, shard):
+        """Rebuild a shard from its live vectors and drop tombstoned rows"""
+        with self._writing(shard):
+            index = self._get_shard(shard)
+            if index is None:
+                return
+            rows = self._query("SELECT id, deleted FROM chunks WHERE shard = ? ORDER BY id", (shard,))
+            live_ids = np.array([chunk_id for chunk_id, deleted in rows if not deleted], dtype="int64")
+            rebuilt = self._new_shard(index.d)
+            if len(live_ids):
+                rebuilt.add_with_ids(index.reconstruct_batch(live_ids), live_ids)
+            self._shards[shard] = rebuilt
+            self._save_shard(shard)
+            # Only rows that were dead when the shard was rebuilt; anything tombstoned since keeps its vector until next time
+            with self._db_lock:
+                self._db.executemany(
+                    "DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id, deleted in rows if deleted]
+                )
+                self._db.commit()
+        print(f"[AI] Shared index: compacted shard {shard} to {len(live_ids)} vectors")
+
+    def search(self, query_vector, k=5, document_id=None, user_id=None):
+        """Return up to k (text, metadata, distance) hits restricted to a document or user"""
+        if document_id is not None:
+            rows = self._query("SELECT id, shard FROM chunks WHERE document_id = ? AND deleted = 0", (document_id,))
+        elif user_id is not None:
+            rows = self._query("SELECT id, shard FROM chunks WHERE user_id = ? AND deleted = 0", (user_id,))
+        else:
+            raise ValueError("search requires a document_id or user_id filter")
+
+        ids_by_shard = {}
+        for chunk_id, shard in rows:
+            ids_by_shard.setdefault(shard, []).append(chunk_id)
+
+        query = np.asarray([query_vector], dtype="float32")
+        hits = []
+        for shard, ids in ids_by_shard.items():
+            with self._locks[shard]:
+                index = self._get_shard(shard)
+                if index is None:
+                    continue
+                ids = np.array(ids, dtype="int64")
+                if len(ids) <= BRUTE_FORCE_LIMIT:
+                    # Exact search over the document's own vectors
+                    vectors = index.reconstruct_batch(ids)
+                    distances = ((vectors - query) ** 2).sum(axis=1)
+                    order = np.argsort(distances)[:k]
+                    hits.extend((float(distances[i]), int(ids[i])) for i in order)
+                else:
+                    params = faiss.SearchParametersHNSW(
+                        sel=faiss.IDSelectorBatch(ids),
+                        efSearch=max(self.ef_search, k * 8)
+                    )
+                    distances, found = index.search(query, k, params=params)
+                    hits.extend((float(d), int(i)) for d, i in zip(distances[0], found[0]) if i >= 0)
+
+        hits.sort()
+        hits = hits[:k]
+        if not hits:
+            return []
+
+        placeholders = ",".join("?" * len(hits))
+        rows = self._query(
+            f"SELECT id, document_id, user_id, chunk_id, chunk_hash, start_offset, end_offset, text FROM chunks WHERE id IN ({placeholders})",
+            [chunk_id for _, chunk_id in hits]
+        )
+        by_id = {row[0]: row for row in rows}
+        results = []
+        for distance, chunk_id in hits:
+            row = by_id.get(chunk_id)
+            if row:
+                metadata = {
+                    "document_id": row[1], "user_id": row[2], "chunk_id": row[3],
+                    "chunk_hash": row[4], "start": row[5], "end": row[6]
+                }
+                results.append((row[7], metadata, distance))
+        return results
+
+class SharedIndexView:
+    """Per-document view of the shared index with the FAISS store's search interface"""
+
+    def __init__(self, index, document_id, embeddings):
+        self.index = index
+        self.document_id = document_id
+        self.embeddings = embeddings
+
+    @property
+    def generation(self):
+        return self.index.document_generation(self.document_id)
+
+    def chunk_texts(self, chunk_ids=None):
+        return self.index.chunk_texts(self.document_id, chunk_ids)
+
+    def similarity_search(self, query, k=4):
+        query_vector = self.embeddings.embed_query(query)
+        return [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata, _ in self.index.search(query_vector, k=k, document_id=self.document_id)
+        ]
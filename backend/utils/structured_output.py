@@ -0,0 +1,307 @@
+import json
+import re
+import threading
+from collections import Counter
+
+# Response schema for knowledge-graph extraction, in the OpenAPI subset the model's JSON mode accepts.
+# Schema objects cannot be free-form, so node properties travel as key/value pairs and are
+# folded back into a dict by validate_graph().
+GRAPH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "nodes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "label": {"type": "string"},
+                    "type": {"type": "string"},
+                    "properties": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {"key": {"type": "string"}, "value": {"type": "string"}},
+                            "required": ["key", "value"]
+                        }
+                    }
+                },
+                "required": ["id", "label", "type"]
+            }
+        },
+        "edges": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "source": {"type": "string"},
+                    "target": {"type": "string"},
+                    "relationship": {"type": "string"},
+                    "weight": {"type": "number"}
+                },
+                "required": ["source", "target", "relationship"]
+            }
+        },
+        "topics": {"type": "array", "items": {"type": "string"}},
+        "action_items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "task": {"type": "string"},
+                    "assignee": {"type": "string"},
+                    "due_date": {"type": "string"},
+                    "priority": {"type": "string"}
+                },
+                "required": ["task"]
+            }
+        }
+    },
+    "required": ["nodes", "edges", "topics", "action_items"]
+}
+
+ANSWERS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"question": {"type": "string"}, "answer": {"type": "string"}},
+                "required": ["question", "answer"]
+            }
+        }
+    },
+    "required": ["answers"]
+}
+
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+LITERAL_OUTSIDE_STRINGS = re.compile(r'"(?:\\.|[^"\\])*"|\b(True|False|None)\b')
+SMART_QUOTES = "\u201c\u201d"
+
+class StructuredOutputError(ValueError):
+    """A model response that could not be turned into the expected structure"""
+
+class ParseStats:
+    """Per-operation counts of how model JSON responses were handled.
+
+    Outcomes are "parsed" (valid as returned), "repaired" (valid after
+    repair_json), "failed" (not JSON even after repair) and "invalid"
+    (JSON, but rejected by the validator).
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, outcome):
+        with self._lock:
+            self._counts.setdefault(operation, Counter())[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return {operation: dict(counts) for operation, counts in self._counts.items()}
+
+parse_stats = ParseStats()
+
+def strip_code_fence(response_text):
+    """Remove markdown code block markers around a JSON response"""
+    json_text = response_text.strip()
+
+    if json_text.startswith('```json'):
+        json_text = json_text[7:]
+    elif json_text.startswith('```'):
+        json_text = json_text[3:]
+
+    if json_text.endswith('```'):
+        json_text = json_text[:-3]
+
+    return json_text.strip()
+
+def _drop_trailing_comma(out):
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
+
+def _close(out, stack):
+    _drop_trailing_comma(out)
+    text = "".join(out).rstrip()
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(stack))
+
+def _literal(match):
+    return PYTHON_LITERALS[match.group(1)] if match.group(1) else match.group(0)
+
+def repair_json(text):
+    """Best-effort fix of near-valid JSON from a model; returns the repaired text.
+
+    Handles surrounding prose and code fences, smart quotes used as JSON
+    string delimiters, Python literals, raw newlines inside strings,
+    trailing commas and output truncated mid-value (the unfinished element
+    is dropped and open brackets are closed). Smart quotes inside a string
+    value are kept as they are. One linear scan, no model call.
+    """
+    text = strip_code_fence(text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    out, stack = [], []
+    in_string = escape = False
+    # Characters that end the current string: a string opened by a smart quote may be closed by one
+    closers = '"'
+    # Last point where everything before it is complete, for truncated output
+    safe = None
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch in closers:
+                in_string = False
+                ch = '"'
+            elif ch == "\n":
+                ch = "\\n"
+            out.append(ch)
+            continue
+        if ch == '"' or ch in SMART_QUOTES:
+            in_string = True
+            closers = '"' if ch == '"' else '"' + SMART_QUOTES
+            ch = '"'
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            out.append(stack.pop() if stack else ch)
+            if not stack:
+                break
+            safe = (len(out), list(stack))
+            continue
+        elif ch == ",":
+            safe = (len(out), list(stack))
+        out.append(ch)
+    else:
+        # Ran out of text with brackets still open
+        if in_string:
+            out.append('"')
+        candidate = _close(out, stack)
+        try:
+            json.loads(LITERAL_OUTSIDE_STRINGS.sub(_literal, candidate))
+        except ValueError:
+            if safe is not None:
+                candidate = _close(out[:safe[0]], safe[1])
+        return LITERAL_OUTSIDE_STRINGS.sub(_literal, candidate)
+
+    return LITERAL_OUTSIDE_STRINGS.sub(_literal, "".join(out))
+
+def parse_json_response(response_text, operation, validate=None):
+    """Parse a model JSON response, repairing it if needed, and validate it.
+
+    Every call is counted in parse_stats. Raises StructuredOutputError when
+    the response cannot be used.
+    """
+    outcome = "parsed"
+    try:
+        data = json.loads(strip_code_fence(response_text))
+    except ValueError:
+        try:
+            data = json.loads(repair_json(response_text))
+            outcome = "repaired"
+        except ValueError as e:
+            parse_stats.record(operation, "failed")
+            raise StructuredOutputError(f"Unparseable {operation} response: {e}") from e
+
+    if validate is not None:
+        try:
+            data = validate(data)
+        except (ValueError, TypeError) as e:
+            parse_stats.record(operation, "invalid")
+            raise StructuredOutputError(f"Invalid {operation} response: {e}") from e
+
+    parse_stats.record(operation, outcome)
+    return data
+
+def _text(value):
+    if value is None:
+        return ""
+    return value.strip() if isinstance(value, str) else str(value)
+
+def _slug(value):
+    return re.sub(r"\W+", "_", value.lower()).strip("_")
+
+def _node_properties(value):
+    if isinstance(value, dict):
+        return {str(k): v for k, v in value.items()}
+    if isinstance(value, list):
+        return {
+            _text(item.get("key")): item.get("value")
+            for item in value
+            if isinstance(item, dict) and _text(item.get("key"))
+        }
+    return {}
+
+def validate_graph(data):
+    """Normalise a knowledge-graph response; raises ValueError if it is not a graph at all.
+
+    Missing sections become empty lists, nodes without an id get one from
+    their type and label, node properties sent as key/value pairs become a
+    dict, and entries that cannot be used (nodes with no name, edges
+    without both ends, action items without a task) are dropped.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"expected an object, got {type(data).__name__}")
+    if not any(key in data for key in ("nodes", "edges", "topics", "action_items")):
+        raise ValueError("no graph sections in response")
+
+    nodes = []
+    for node in data.get("nodes") or []:
+        if not isinstance(node, dict):
+            continue
+        label = _text(node.get("label")) or _text(node.get("id"))
+        if not label:
+            continue
+        node_type = _text(node.get("type")).lower() or "concept"
+        nodes.append({
+            **node,
+            "id": _text(node.get("id")) or f"{node_type}_{_slug(label)}",
+            "label": label,
+            "type": node_type,
+            "properties": _node_properties(node.get("properties"))
+        })
+
+    edges = []
+    for edge in data.get("edges") or []:
+        if not isinstance(edge, dict) or not _text(edge.get("source")) or not _text(edge.get("target")):
+            continue
+        try:
+            weight = float(edge.get("weight", 1.0))
+        except (TypeError, ValueError):
+            weight = 1.0
+        edges.append({
+            **edge,
+            "source": _text(edge["source"]),
+            "target": _text(edge["target"]),
+            "relationship": _text(edge.get("relationship")) or "related_to",
+            "weight": weight
+        })
+
+    return {
+        **data,
+        "nodes": nodes,
+        "edges": edges,
+        "topics": [_text(topic) for topic in data.get("topics") or [] if _text(topic)],
+        "action_items": [
+            item for item in data.get("action_items") or []
+            if isinstance(item, dict) and _text(item.get("task"))
+        ]
+    }
+
+def validate_answers(data):
+    if not isinstance(data, dict) or not isinstance(data.get("answers"), list):
+        raise ValueError("expected an object with an answers list")
+    return data["answers"]
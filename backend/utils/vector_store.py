@@ -0,0 +1,397 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+
+# One row per chunk; the chunk text is transcript[start:end], or the UTF-8 bytes [byte_start:byte_end]
+CHUNK_TABLE_DTYPE = np.dtype([
+    ("chunk_id", "<i4"),
+    ("start", "<i8"),
+    ("end", "<i8"),
+    ("hash", "S64"),
+    ("byte_start", "<i8"),
+    ("byte_end", "<i8"),
+])
+
+MANIFEST_FILE = "manifest.json"
+# Version 1 stores used fixed file names; later versions name each file by generation
+V1_FILES = {"index": "index.faiss", "table": "chunks.npy", "transcript": "transcript.txt"}
+# Written by LangChain's FAISS.save_local: a pickled docstore next to index.faiss
+LEGACY_DOCSTORE_FILE = "index.pkl"
+# Held by whichever process is writing or migrating a store
+WRITER_LOCK_FILE = "writer.lock"
+
+_held_locks = threading.local()
+
+def _write_atomic(path, write):
+    # Unique per writer, so two workers saving the same store never share a temp file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+@contextmanager
+def _writer_lock(path):
+    """Serialise writers of one store directory across threads and processes; re-entrant per thread"""
+    held = getattr(_held_locks, "paths", None)
+    if held is None:
+        held = _held_locks.paths = set()
+    key = os.path.abspath(path)
+    if key in held:
+        yield
+        return
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, WRITER_LOCK_FILE), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _mmap_flags():
+    # IO_FLAG_MMAP_IFC maps flat vector storage in place; plain IO_FLAG_MMAP still copies it on older faiss
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+class DocumentVectorStore:
+    """A document's chunk vectors on disk, without pickles or duplicated text.
+
+    A store directory holds the raw FAISS index, a numpy table of
+    (chunk_id, start, end, hash) rows, the document text, and a JSON
+    manifest. Loading reads the index and the table; the text is only
+    read when a search needs to return chunk contents, and each chunk is a
+    slice of it.
+
+    Every save writes a new generation of files and then swaps the
+    manifest to point at them with an atomic rename, so a reader always
+    sees one complete generation. Writers take a lock file for the whole
+    save, so one never deletes files another is about to publish. Files are never modified in place, which
+    is what makes memory-mapped loading safe: with mmap=True the index and
+    text are mapped read-only and their pages live in the OS page cache,
+    shared by every worker process that has the store open. Loaded stores
+    must not be modified.
+    """
+
+    FORMAT_VERSION = 2
+
+    def __init__(self, path, index, table, manifest, embeddings, transcript=None, mapped_transcript=None, transcript_file=None):
+        self.path = path
+        self.index = index
+        self.table = table
+        self.manifest = manifest
+        self.embeddings = embeddings
+        self._transcript = transcript
+        self._mapped_transcript = mapped_transcript
+        self.mapped = mapped_transcript is not None
+        self._transcript_file = transcript_file
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+    @staticmethod
+    def is_legacy(path):
+        """A LangChain FAISS.save_local directory that has not been migrated yet"""
+        return (
+            os.path.exists(os.path.join(path, LEGACY_DOCSTORE_FILE))
+            and not DocumentVectorStore.exists(path)
+        )
+
+    @classmethod
+    def build(cls, path, document_id, transcript, spans, vectors, embeddings):
+        """Write a store for transcript chunked at spans, with one vector per span, and return it"""
+        vectors = np.asarray(vectors, dtype="float32")
+        if len(spans):
+            vectors = vectors.reshape(len(spans), -1)
+        elif vectors.ndim != 2:
+            # Blank text has no chunks; the empty index answers every search with no hits
+            vectors = vectors.reshape(0, 0)
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        if len(vectors):
+            index.add(vectors)
+
+        table = np.zeros(len(spans), dtype=CHUNK_TABLE_DTYPE)
+        # Byte offsets are counted incrementally between consecutive span boundaries
+        boundaries = sorted({offset for span in spans for offset in span})
+        byte_offsets, position, byte_position = {}, 0, 0
+        for offset in boundaries:
+            byte_position += len(transcript[position:offset].encode("utf-8"))
+            byte_offsets[offset] = byte_position
+            position = offset
+        for i, (start, end) in enumerate(spans):
+            chunk_hash = hashlib.sha256(transcript[start:end].encode("utf-8")).hexdigest().encode("ascii")
+            table[i] = (i, start, end, chunk_hash, byte_offsets[start], byte_offsets[end])
+
+        manifest = {
+            "version": cls.FORMAT_VERSION,
+            "document_id": document_id,
+            "count": len(spans),
+            "dimension": int(index.d),
+            "metric": "l2",
+            # Vectors from another embedding model are not comparable, so updates must not reuse them
+            "embedding_model": getattr(embeddings, "model_name", None),
+            "transcript_sha256": hashlib.sha256(transcript.encode("utf-8")).hexdigest(),
+            "created_at": datetime.utcnow().isoformat() + "Z",
+        }
+        store = cls(path, index, table, manifest, embeddings, transcript)
+        store.save()
+        return store
+
+    def save(self):
+        """Write a new generation of files, publish it through the manifest, then drop older ones"""
+        with _writer_lock(self.path):
+            self._save()
+
+    def _save(self):
+        generation = uuid.uuid4().hex[:12]
+        files = {
+            "index": f"index.{generation}.faiss",
+            "table": f"chunks.{generation}.npy",
+            "transcript": f"transcript.{generation}.txt",
+        }
+
+        def write_table(tmp):
+            with open(tmp, "wb") as f:
+                np.save(f, self.table, allow_pickle=False)
+
+        def write_transcript(tmp):
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                f.write(self.transcript)
+
+        _write_atomic(os.path.join(self.path, files["index"]), lambda tmp: faiss.write_index(self.index, tmp))
+        _write_atomic(os.path.join(self.path, files["table"]), write_table)
+        _write_atomic(os.path.join(self.path, files["transcript"]), write_transcript)
+
+        self.manifest = {**self.manifest, "version": self.FORMAT_VERSION, "generation": generation, "files": files}
+
+        def write_manifest(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f)
+
+        # Readers switch to the new generation here, all at once
+        _write_atomic(os.path.join(self.path, MANIFEST_FILE), write_manifest)
+        self._remove_stale_files(set(files.values()))
+
+    def _remove_stale_files(self, keep):
+        """Delete earlier generations; processes that still map them keep their view until they reload.
+
+        Called with the writer lock held, so no other generation is in flight.
+        """
+        stale = set(V1_FILES.values())
+        for name in os.listdir(self.path):
+            if name.startswith(("index.", "chunks.", "transcript.")) and not name.endswith(".tmp"):
+                stale.add(name)
+        # A LangChain store kept next to the new one (migrate --keep-legacy) stays loadable
+        stale.discard(LEGACY_DOCSTORE_FILE)
+        if os.path.exists(os.path.join(self.path, LEGACY_DOCSTORE_FILE)):
+            stale.discard(V1_FILES["index"])
+        for name in stale - keep:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def load(cls, path, embeddings, mmap=False):
+        """Open a store; with mmap=True the index and text are mapped read-only instead of read"""
+        for attempt in range(3):
+            manifest = cls._read_manifest(path)
+            try:
+                return cls._load(path, manifest, embeddings, mmap)
+            except (OSError, RuntimeError):
+                # A writer published a new generation and removed this one between reading the manifest and its files
+                if attempt == 2 or cls._read_manifest(path).get("generation") == manifest.get("generation"):
+                    raise
+
+    @staticmethod
+    def _read_manifest(path):
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def _load(cls, path, manifest, embeddings, use_mmap):
+        if manifest.get("version") not in (1, cls.FORMAT_VERSION):
+            raise ValueError(f"Unsupported vector store version {manifest.get('version')} in {path}")
+        files = manifest.get("files", V1_FILES)
+
+        index_path = os.path.join(path, files["index"])
+        index = faiss.read_index(index_path, _mmap_flags()) if use_mmap else faiss.read_index(index_path)
+        table = np.load(os.path.join(path, files["table"]), allow_pickle=False)
+        if index.ntotal != len(table):
+            raise ValueError(f"Vector store in {path} has {index.ntotal} vectors but {len(table)} chunks")
+
+        mapped_transcript = None
+        # Version 1 tables have no byte offsets, so their text is always read and sliced by character
+        if use_mmap and "byte_start" in table.dtype.names:
+            with open(os.path.join(path, files["transcript"]), "rb") as f:
+                mapped_transcript = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        return cls(path, index, table, manifest, embeddings, mapped_transcript=mapped_transcript, transcript_file=files["transcript"])
+
+    @property
+    def transcript(self):
+        if self._transcript is None:
+            if self._mapped_transcript is not None:
+                self._transcript = self._mapped_transcript[:].decode("utf-8")
+            else:
+                with open(os.path.join(self.path, self._transcript_file), encoding="utf-8", newline="") as f:
+                    self._transcript = f.read()
+        return self._transcript
+
+    def _chunk_text(self, row):
+        if self._mapped_transcript is not None:
+            return self._mapped_transcript[int(self.table["byte_start"][row]):int(self.table["byte_end"][row])].decode("utf-8")
+        return self.transcript[int(self.table["start"][row]):int(self.table["end"][row])]
+
+    @property
+    def generation(self):
+        """Identifies this version of the store's chunks"""
+        return self.manifest.get("generation") or self.manifest.get("transcript_sha256")
+
+    def chunk_texts(self, chunk_ids=None):
+        """Map chunk id to chunk text, for the given ids or every chunk; rows are numbered by chunk id"""
+        rows = range(len(self.table)) if chunk_ids is None else chunk_ids
+        return {int(row): self._chunk_text(int(row)) for row in rows}
+
+    def chunk_ids(self):
+        """Docstore-style ids ("<hash>:<occurrence>") for every row, in row order"""
+        ids = []
+        seen = {}
+        for chunk_hash in self.table["hash"]:
+            chunk_hash = chunk_hash.decode("ascii")
+            occurrence = seen.get(chunk_hash, 0)
+            seen[chunk_hash] = occurrence + 1
+            ids.append(f"{chunk_hash}:{occurrence}")
+        return ids
+
+    @property
+    def embedding_model(self):
+        """Provider/model name the stored vectors came from, or None for stores written before it was recorded"""
+        return self.manifest.get("embedding_model")
+
+    def vectors_by_id(self):
+        """Map chunk id to its stored vector, so an update only embeds new chunks"""
+        if not len(self.table):
+            return {}
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        return dict(zip(self.chunk_ids(), vectors))
+
+    def _document(self, row):
+        start, end = int(self.table["start"][row]), int(self.table["end"][row])
+        return Document(
+            page_content=self._chunk_text(row),
+            metadata={
+                "document_id": self.manifest.get("document_id"),
+                "chunk_id": int(self.table["chunk_id"][row]),
+                "chunk_hash": self.table["hash"][row].decode("ascii"),
+                "start": start,
+                "end": end,
+            }
+        )
+
+    def similarity_search_with_score_by_vector(self, vector, k=4):
+        if not self.index.ntotal:
+            return []
+        distances, rows = self.index.search(np.asarray([vector], dtype="float32"), min(k, self.index.ntotal))
+        return [(self._document(int(row)), float(distance)) for distance, row in zip(distances[0], rows[0]) if row >= 0]
+
+    def similarity_search(self, query, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k)]
+
+    def nbytes(self):
+        """Approximate private memory footprint, for byte-budgeted caches; mapped pages are shared and not counted"""
+        size = self.table.nbytes
+        if not self.mapped:
+            size += self.index.ntotal * self.index.d * 4
+        if self._transcript is not None:
+            size += len(self._transcript)
+        return size
+
+def migrate_legacy_store(path, embeddings=None, document_id=None, remove_legacy=True):
+    """Convert a LangChain FAISS.save_local directory in place; returns the new store.
+
+    The pickled docstore is read once, here, from our own files. Vectors
+    are copied from the existing index, so nothing is re-embedded. Chunks
+    that carry start/end offsets are placed at those offsets in a
+    reconstructed text; older chunks without offsets are laid end to end.
+    Either way every chunk is an exact slice of the stored text.
+    """
+    with _writer_lock(path):
+        if not DocumentVectorStore.is_legacy(path):
+            # Another worker converted it while we waited for the lock
+            return DocumentVectorStore.load(path, embeddings)
+        return _migrate_legacy_store(path, embeddings, document_id, remove_legacy)
+
+class _LegacyDocstore:
+    """Stands in for LangChain's InMemoryDocstore, so legacy stores unpickle with langchain-core alone"""
+
+    def search(self, doc_id):
+        return self._dict[doc_id]
+
+def _load_legacy_docstore(file):
+    import pickle
+
+    class Unpickler(pickle.Unpickler):
+        def find_class(self, module, name):
+            if name == "InMemoryDocstore":
+                return _LegacyDocstore
+            if name == "Document" and module.startswith("langchain"):
+                return Document
+            return super().find_class(module, name)
+
+    return Unpickler(file).load()
+
+def _migrate_legacy_store(path, embeddings, document_id, remove_legacy):
+    with open(os.path.join(path, LEGACY_DOCSTORE_FILE), "rb") as f:
+        docstore, index_to_docstore_id = _load_legacy_docstore(f)
+    index = faiss.read_index(os.path.join(path, V1_FILES["index"]))
+    vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), dtype="float32")
+
+    documents = [docstore.search(index_to_docstore_id[row]) for row in range(index.ntotal)]
+    with_offsets = sorted(
+        (row for row, doc in enumerate(documents) if doc.metadata.get("start") is not None),
+        key=lambda row: documents[row].metadata["start"]
+    )
+    without_offsets = [row for row, doc in enumerate(documents) if doc.metadata.get("start") is None]
+
+    parts, spans, length = [], [None] * len(documents), 0
+    for row in with_offsets:
+        # Chunks came from one text, so overlapping parts agree; only the new tail is appended
+        text, start = documents[row].page_content, documents[row].metadata["start"]
+        if start > length:
+            parts.append(" " * (start - length))
+        if start + len(text) > length:
+            parts.append(text[max(0, length - start):])
+            length = start + len(text)
+        spans[row] = (start, start + len(text))
+    for row in without_offsets:
+        text = documents[row].page_content
+        if length:
+            parts.append("\n\n")
+            length += 2
+        parts.append(text)
+        spans[row] = (length, length + len(text))
+        length += len(text)
+    transcript = "".join(parts)
+
+    document_id = document_id or os.path.basename(os.path.normpath(path))
+    if documents:
+        document_id = documents[0].metadata.get("document_id", document_id)
+
+    # Keep the existing row order so chunk ids and vectors stay aligned
+    store = DocumentVectorStore.build(path, document_id, transcript, spans, vectors, embeddings)
+    if remove_legacy:
+        os.remove(os.path.join(path, LEGACY_DOCSTORE_FILE))
+        # Left in place by _remove_stale_files while index.pkl still needed it
+        try:
+            os.remove(os.path.join(path, V1_FILES["index"]))
+        except FileNotFoundError:
+            pass
+    return store
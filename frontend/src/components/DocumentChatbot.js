@@ -21,7 +21,7 @@ const DocumentChatbot = ({ documentId }) => {
   const [suggestions, setSuggestions] = useState([]);
   const [copied, setCopied] = useState(null);
   const messagesEndRef = useRef(null);
-  const { makeAuthenticatedRequest } = useAuth();
+  const { makeAuthenticatedRequest, waitForJob } = useAuth();
 
   useEffect(() => {
     loadChatHistory();
@@ -74,6 +74,37 @@ const DocumentChatbot = ({ documentId }) => {
     }
   };
 
+  // Parse a Server-Sent Events response body, calling onEvent(event, data) per message
+  const readEventStream = async (response, onEvent) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+
+      for (const rawEvent of events) {
+        let event = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) {
+            event = line.slice(7);
+          } else if (line.startsWith('data: ')) {
+            data += line.slice(6);
+          }
+        }
+        if (data) {
+          onEvent(event, JSON.parse(data));
+        }
+      }
+    }
+  };
+
   const sendMessage = async (question = inputValue) => {
     if (!question.trim()) return;
 
@@ -89,36 +120,72 @@ const DocumentChatbot = ({ documentId }) => {
     setIsLoading(true);
 
     try {
-      const response = await makeAuthenticatedRequest(`/chatbot/${documentId}/chat`, {
+      const askQuestion = () => makeAuthenticatedRequest(`/chatbot/${documentId}/chat/stream`, {
         method: 'POST',
         body: JSON.stringify({ message: question }) // Fix: Use 'message' key
       });
 
-      if (response.ok) {
+      let response = await askQuestion();
+
+      // Large documents are indexed in the background on first use
+      if (response.status === 202) {
+        const pending = await response.json();
+        if (pending.retry_after_job) {
+          await waitForJob(pending.job_id);
+          response = await askQuestion();
+        }
+      }
+
+      const botId = Date.now() + 1;
+      const updateBotMessage = (changes) => {
+        setMessages(prev => prev.map(message => (
+          message.id === botId ? { ...message, ...changes } : message
+        )));
+      };
+
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        const errorMessage = {
+          id: botId,
+          type: 'bot',
+          content: `Error: ${errorData.error || 'Failed to get response'}`,
+          timestamp: new Date(),
+          isError: true
+        };
+        setMessages(prev => [...prev, errorMessage]);
+      } else if ((response.headers.get('Content-Type') || '').includes('text/event-stream')) {
+        // Show tokens as they arrive instead of waiting for the full answer
+        setMessages(prev => [...prev, { id: botId, type: 'bot', content: '', timestamp: new Date() }]);
+        setIsLoading(false);
+
+        await readEventStream(response, (event, data) => {
+          if (event === 'token') {
+            setMessages(prev => prev.map(message => (
+              message.id === botId ? { ...message, content: message.content + data.text } : message
+            )));
+          } else if (event === 'done') {
+            updateBotMessage({ content: data.response, suggestions: data.suggestions });
+            if (data.suggestions) {
+              setSuggestions(data.suggestions);
+            }
+          } else if (event === 'error') {
+            updateBotMessage({ content: `Error: ${data.error || 'Failed to get response'}`, isError: true });
+          }
+        });
+      } else {
         const data = await response.json();
-        const botMessage = {
-          id: Date.now() + 1,
+        setMessages(prev => [...prev, {
+          id: botId,
           type: 'bot',
           content: data.response,
           timestamp: new Date(),
           suggestions: data.suggestions
-        };
-        setMessages(prev => [...prev, botMessage]);
+        }]);
         
         // Update suggestions if provided
         if (data.suggestions) {
           setSuggestions(data.suggestions);
         }
-      } else {
-        const errorData = await response.json();
-        const errorMessage = {
-          id: Date.now() + 1,
-          type: 'bot',
-          content: `Error: ${errorData.error || 'Failed to get response'}`,
-          timestamp: new Date(),
-          isError: true
-        };
-        setMessages(prev => [...prev, errorMessage]);
       }
     } catch (error) {
       console.error('Failed to send message:', error);
@@ -165,6 +165,38 @@ export const AuthProvider = ({ children }) => {
     }
   };
 
+  // Poll a background job until it completes and return its result
+  const waitForJob = async (jobId, { interval = 1500, timeout = 15 * 60 * 1000, onProgress } = {}) => {
+    const deadline = Date.now() + timeout;
+
+    while (true) {
+      const response = await makeAuthenticatedRequest(`/jobs/${jobId}`);
+
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.error || `HTTP ${response.status}`);
+      }
+
+      const job = await response.json();
+
+      if (onProgress) {
+        onProgress(job);
+      }
+
+      if (job.status === 'completed') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Background job failed');
+      }
+      if (Date.now() + interval > deadline) {
+        throw new Error('Timed out waiting for the background job to finish');
+      }
+
+      await new Promise(resolve => setTimeout(resolve, interval));
+    }
+  };
+
   // Special function for file downloads
   const downloadFile = async (url, filename) => {
     if (!token) {
@@ -231,6 +263,7 @@ export const AuthProvider = ({ children }) => {
     register,
     logout,
     makeAuthenticatedRequest,
+    waitForJob,
     downloadFile,
     updateProfile,
     isAuthenticated: !!user && !!token,
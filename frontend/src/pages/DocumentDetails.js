@@ -545,7 +545,7 @@ const DocumentDetails = ({ documentId, activeTab, onBack, onTabChange }) => {
 
 // Updated Summary Component with better styling
 const SummaryView = ({ summary, documentId }) => {
-  const { makeAuthenticatedRequest } = useAuth();
+  const { makeAuthenticatedRequest, waitForJob } = useAuth();
   const [isGenerating, setIsGenerating] = useState(false);
   const [generatedSummary, setGeneratedSummary] = useState(summary);
   const [error, setError] = useState('');
@@ -564,7 +564,9 @@ const SummaryView = ({ summary, documentId }) => {
 
       if (response.ok) {
         const data = await response.json();
-        setGeneratedSummary(data.summary);
+        // Summaries are generated by a background job
+        const result = response.status === 202 ? await waitForJob(data.job_id) : data;
+        setGeneratedSummary(result.summary);
         console.log('Summary generated successfully');
       } else {
         const errorData = await response.json();
@@ -789,7 +791,7 @@ const KnowledgeGraphView = ({ document, documentId }) => {
   const [graphData, setGraphData] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
-  const { makeAuthenticatedRequest } = useAuth();
+  const { makeAuthenticatedRequest, waitForJob } = useAuth();
 
   const fetchKnowledgeGraph = async () => {
     try {
@@ -827,7 +829,9 @@ const KnowledgeGraphView = ({ document, documentId }) => {
       
       if (response.ok) {
         const data = await response.json();
-        setGraphData(data.graph);
+        // Knowledge graphs are generated by a background job
+        const result = response.status === 202 ? await waitForJob(data.job_id) : data;
+        setGraphData(result.graph);
       } else {
         throw new Error('Failed to generate knowledge graph');
       }